@@ -0,0 +1,47 @@
+"""Memory, throughput and accuracy of HyperLogLog unique-viewer sketches vs. exact sets.
+
+    python -m Lesson1.bench_hyperloglog --counts 1000 100000 1000000 --precisions 10 12 14
+"""
+import argparse
+import sys
+import time
+
+from .hyperloglog import HyperLogLog
+
+
+def set_bytes(viewers: set) -> int:
+    """Rough size of an exact set of viewer ids: the set table plus its strings"""
+    return sys.getsizeof(viewers) + sum(sys.getsizeof(viewer) for viewer in viewers)
+
+
+def main(counts, precisions) -> None:
+    print(f"{'viewers':>10}{'precision':>11}{'bytes':>10}{'set bytes':>12}{'estimate':>11}"
+          f"{'error':>9}{'adds/s':>11}{'count us':>10}{'merge us':>10}")
+    for count in counts:
+        viewer_ids = [f"viewer-{index}" for index in range(count)]
+        exact = set_bytes(set(viewer_ids))
+        for precision in precisions:
+            sketch = HyperLogLog(precision)
+            started = time.perf_counter()
+            sketch.update(viewer_ids)
+            adds_per_second = count / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            estimate = sketch.count()
+            count_us = (time.perf_counter() - started) * 1e6
+
+            other = sketch.copy()
+            started = time.perf_counter()
+            other.merge(sketch)
+            merge_us = (time.perf_counter() - started) * 1e6
+
+            print(f"{count:>10}{precision:>11}{len(sketch.to_bytes()):>10}{exact:>12}{estimate:>11}"
+                  f"{(estimate - count) / count:>9.2%}{adds_per_second:>11.0f}{count_us:>10.0f}{merge_us:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--precisions", type=int, nargs="+", default=[10, 12, 14])
+    args = parser.parse_args()
+    main(args.counts, args.precisions)
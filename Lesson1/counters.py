@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from .hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+Totals = Tuple[int, int]  # (likes, views)
+
+
+def merge_sketch(data: bytes, sketch: Optional[bytes]) -> bytes:
+    """Union of two serialized HyperLogLog sketches (sketch may be empty)"""
+    if not sketch:
+        return data
+    return HyperLogLog.from_bytes(data).merge(HyperLogLog.from_bytes(sketch)).to_bytes()
+
+
+class PendingCounter:
+    """Like/view increments not yet flushed to the store.
+
+    Only touched from the event loop and never across an await, so plain dict updates need no lock.
+    """
+
+    def __init__(self):
+        self._deltas: Dict[int, List[int]] = {}
+
+    def add(self, video_id: int, likes: int = 0, views: int = 0) -> None:
+        delta = self._deltas.get(video_id)
+        if delta is None:
+            self._deltas[video_id] = [likes, views]
+        else:
+            delta[0] += likes
+            delta[1] += views
+
+    def pending(self, video_id: int) -> Totals:
+        delta = self._deltas.get(video_id)
+        return (delta[0], delta[1]) if delta else (0, 0)
+
+    def drain(self) -> Dict[int, Totals]:
+        """Take every pending delta, leaving the counter empty"""
+        deltas, self._deltas = self._deltas, {}
+        return {video_id: (likes, views) for video_id, (likes, views) in deltas.items()}
+
+
+class MemoryCounterBackend:
+    """Single-process store, used when no database is configured"""
+
+    def __init__(self):
+        self._totals: Dict[int, Totals] = {}
+        self._sketches: Dict[int, bytes] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def apply(self, deltas: Dict[int, Totals]) -> Dict[int, Totals]:
+        for video_id, (likes, views) in deltas.items():
+            current = self._totals.get(video_id, (0, 0))
+            self._totals[video_id] = (current[0] + likes, current[1] + views)
+        return {video_id: self._totals[video_id] for video_id in deltas}
+
+    async def fetch_many(self, video_ids: List[int]) -> Dict[int, Totals]:
+        return {video_id: self._totals.get(video_id, (0, 0)) for video_id in video_ids}
+
+    async def merge_sketches(self, sketches: Dict[int, bytes]) -> Dict[int, bytes]:
+        for video_id, data in sketches.items():
+            self._sketches[video_id] = merge_sketch(data, self._sketches.get(video_id))
+        return {video_id: self._sketches[video_id] for video_id in sketches}
+
+    async def fetch_sketch(self, video_id: int) -> Optional[bytes]:
+        return self._sketches.get(video_id)
+
+    async def close(self) -> None:
+        pass
+
+
+class PostgresCounterBackend:
+    """Durable store shared by all workers; deltas are added with one upsert per flush"""
+
+    def __init__(self, dsn: str, pool_size: int = 4):
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self.pool: Optional[asyncpg.Pool] = None
+
+    async def connect(self) -> None:
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_counters (
+                    video_id BIGINT PRIMARY KEY,
+                    likes BIGINT NOT NULL DEFAULT 0,
+                    views BIGINT NOT NULL DEFAULT 0
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_viewer_sketches (
+                    video_id BIGINT PRIMARY KEY,
+                    sketch BYTEA NOT NULL
+                )
+            """)
+
+    async def apply(self, deltas: Dict[int, Totals]) -> Dict[int, Totals]:
+        # Sorted ids keep row locks in the same order across workers (no deadlocks)
+        video_ids = sorted(deltas)
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                INSERT INTO video_counters (video_id, likes, views)
+                SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[])
+                ON CONFLICT (video_id) DO UPDATE
+                SET likes = video_counters.likes + EXCLUDED.likes,
+                    views = video_counters.views + EXCLUDED.views
+                RETURNING video_id, likes, views
+                """,
+                video_ids,
+                [deltas[video_id][0] for video_id in video_ids],
+                [deltas[video_id][1] for video_id in video_ids]
+            )
+        return {row["video_id"]: (row["likes"], row["views"]) for row in rows}
+
+    async def fetch_many(self, video_ids: List[int]) -> Dict[int, Totals]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT video_id, likes, views FROM video_counters WHERE video_id = ANY($1::bigint[])",
+                video_ids
+            )
+        totals = {row["video_id"]: (row["likes"], row["views"]) for row in rows}
+        return {video_id: totals.get(video_id, (0, 0)) for video_id in video_ids}
+
+    async def merge_sketches(self, sketches: Dict[int, bytes]) -> Dict[int, bytes]:
+        video_ids = sorted(sketches)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Create missing rows, then lock them all, so concurrent workers merge one after another
+                await conn.execute(
+                    """
+                    INSERT INTO video_viewer_sketches (video_id, sketch)
+                    SELECT unnest($1::bigint[]), ''::bytea
+                    ON CONFLICT (video_id) DO NOTHING
+                    """,
+                    video_ids
+                )
+                rows = await conn.fetch(
+                    """
+                    SELECT video_id, sketch FROM video_viewer_sketches
+                    WHERE video_id = ANY($1::bigint[])
+                    ORDER BY video_id
+                    FOR UPDATE
+                    """,
+                    video_ids
+                )
+                merged = {row["video_id"]: merge_sketch(sketches[row["video_id"]], row["sketch"]) for row in rows}
+                await conn.execute(
+                    """
+                    UPDATE video_viewer_sketches AS s
+                    SET sketch = v.sketch
+                    FROM unnest($1::bigint[], $2::bytea[]) AS v(video_id, sketch)
+                    WHERE s.video_id = v.video_id
+                    """,
+                    list(merged),
+                    list(merged.values())
+                )
+        return merged
+
+    async def fetch_sketch(self, video_id: int) -> Optional[bytes]:
+        async with self.pool.acquire() as conn:
+            sketch = await conn.fetchval(
+                "SELECT sketch FROM video_viewer_sketches WHERE video_id = $1", video_id
+            )
+        return sketch or None
+
+    async def close(self) -> None:
+        if self.pool:
+            await self.pool.close()
+
+
+class CounterStore:
+    """Video like/view counters: increments are buffered locally and flushed in batches.
+
+    Reads return the last known durable total plus this process's unflushed delta;
+    the durable part is refreshed when it is older than max_staleness seconds.
+    """
+
+    def __init__(
+        self,
+        backend,
+        flush_interval: float = 0.2,
+        max_staleness: float = 1.0,
+        sketch_precision: int = 12
+    ):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.sketch_precision = sketch_precision
+        self._pending = PendingCounter()
+        # Deltas and sketches handed to the running flush: still counted by reads until it stores the result
+        self._in_flight: Dict[int, Totals] = {}
+        self._viewers_in_flight: Dict[int, HyperLogLog] = {}
+        # Durable totals and sketches in the order they were stored, so stale ones are pruned from the front
+        self._totals: "OrderedDict[int, Tuple[Totals, float]]" = OrderedDict()
+        # Cold reads waiting for the next batched backend query
+        self._fetching: Dict[int, asyncio.Future] = {}
+        self._fetch_task: Optional[asyncio.Task] = None
+        # Unique viewers: sketches of viewers seen since the last flush, and the last known durable ones
+        self._viewers: Dict[int, HyperLogLog] = {}
+        self._unique: "OrderedDict[int, Tuple[HyperLogLog, float]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        await self.backend.connect()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush video counters: {str(e)}")
+
+    async def flush(self) -> None:
+        """Write accumulated deltas and viewer sketches to the backend in one batch each"""
+        async with self._flush_lock:
+            await self._flush_totals()
+            await self._flush_viewers()
+
+    async def _flush_totals(self) -> None:
+        deltas = self._in_flight = self._pending.drain()
+        if not deltas:
+            return
+        try:
+            totals = await self.backend.apply(deltas)
+        except BaseException:
+            # Keep the increments for the next flush
+            for video_id, (likes, views) in deltas.items():
+                self._pending.add(video_id, likes, views)
+            raise
+        else:
+            # The new durable totals replace the in-flight deltas in the same step, so reads never dip
+            for video_id, value in totals.items():
+                self._store(self._totals, video_id, value)
+        finally:
+            self._in_flight = {}
+        self._prune(self._totals)
+
+    async def _flush_viewers(self) -> None:
+        viewers = self._viewers_in_flight = self._viewers
+        self._viewers = {}
+        if not viewers:
+            return
+        try:
+            merged = await self.backend.merge_sketches(
+                {video_id: sketch.to_bytes() for video_id, sketch in viewers.items()}
+            )
+        except BaseException:
+            # Merge back into whatever arrived meanwhile, for the next flush
+            for video_id, sketch in viewers.items():
+                current = self._viewers.get(video_id)
+                self._viewers[video_id] = sketch.merge(current) if current else sketch
+            raise
+        else:
+            for video_id, data in merged.items():
+                self._store(self._unique, video_id, HyperLogLog.from_bytes(data))
+        finally:
+            self._viewers_in_flight = {}
+        self._prune(self._unique)
+
+    @staticmethod
+    def _store(cache: OrderedDict, video_id: int, value) -> None:
+        """Cache a durable value as the newest entry"""
+        cache.pop(video_id, None)
+        cache[video_id] = (value, time.monotonic())
+
+    def _prune(self, cache: OrderedDict) -> None:
+        """Drop entries too stale to be read again; only the oldest ones are looked at"""
+        now = time.monotonic()
+        while cache:
+            video_id, cached = next(iter(cache.items()))
+            if now - cached[1] <= self.max_staleness:
+                break
+            del cache[video_id]
+
+    def incr(self, video_id: int, likes: int = 0, views: int = 0) -> None:
+        self._pending.add(video_id, likes, views)
+
+    async def totals(self, video_id: int) -> Totals:
+        """Durable total (at most max_staleness old) plus in-flight and unflushed local increments"""
+        return (await self.totals_many([video_id]))[video_id]
+
+    async def totals_many(self, video_ids: List[int]) -> Dict[int, Totals]:
+        """Totals of several videos, reading all of their stale durable totals in one backend query"""
+        # A few tries: each either finds fresh durable totals or waits out a flush that is writing them
+        for _ in range(3):
+            now = time.monotonic()
+            stale = [
+                video_id for video_id in video_ids
+                if video_id not in self._totals or now - self._totals[video_id][1] > self.max_staleness
+            ]
+            if not stale:
+                break
+            if any(video_id in self._in_flight for video_id in stale):
+                # The running flush returns these durable totals; wait for it instead of racing it
+                async with self._flush_lock:
+                    pass
+                continue
+            started = time.monotonic()
+            values = await self._fetch_many(stale)
+            for video_id, value in values.items():
+                cached = self._totals.get(video_id)
+                if video_id in self._in_flight or (cached is not None and cached[1] >= started):
+                    # A flush of this video overlapped the read, which may or may not include its deltas
+                    continue
+                self._store(self._totals, video_id, value)
+        missing = [video_id for video_id in video_ids if video_id not in self._totals]
+        if missing:
+            for video_id, value in (await self._fetch_many(missing)).items():
+                if video_id not in self._totals:
+                    self._store(self._totals, video_id, value)
+
+        # Summed without awaiting, so a flush cannot move deltas between the parts
+        totals = {}
+        for video_id in video_ids:
+            durable = self._totals[video_id][0]
+            flushing = self._in_flight.get(video_id, (0, 0))
+            likes, views = self._pending.pending(video_id)
+            totals[video_id] = (durable[0] + flushing[0] + likes, durable[1] + flushing[1] + views)
+        return totals
+
+    async def _fetch_many(self, video_ids: List[int]) -> Dict[int, Totals]:
+        """Durable totals from the backend; cold reads started in the same loop tick share one query"""
+        futures = {}
+        for video_id in video_ids:
+            future = self._fetching.get(video_id)
+            if future is None:
+                future = self._fetching[video_id] = asyncio.get_running_loop().create_future()
+            futures[video_id] = future
+        if self._fetch_task is None:
+            self._fetch_task = asyncio.create_task(self._run_fetch())
+        # Shielded, so one cancelled request does not fail the others waiting on the same videos
+        await asyncio.shield(asyncio.gather(*futures.values()))
+        return {video_id: future.result() for video_id, future in futures.items()}
+
+    async def _run_fetch(self) -> None:
+        await asyncio.sleep(0)
+        # Later reads start a new batch, so each query begins after every read it answers
+        fetching, self._fetching = self._fetching, {}
+        self._fetch_task = None
+        try:
+            totals = await self.backend.fetch_many(list(fetching))
+        except Exception as e:
+            for future in fetching.values():
+                future.set_exception(e)
+        else:
+            for video_id, future in fetching.items():
+                future.set_result(totals[video_id])
+        finally:
+            for future in fetching.values():
+                if not future.done():
+                    future.cancel()
+
+    def add_viewer(self, video_id: int, viewer_id: str) -> None:
+        sketch = self._viewers.get(video_id)
+        if sketch is None:
+            sketch = self._viewers[video_id] = HyperLogLog(self.sketch_precision)
+        sketch.add(viewer_id)
+
+    async def unique_views(self, video_id: int) -> int:
+        """Approximate distinct viewers: durable sketch (at most max_staleness old) plus unflushed local ones"""
+        cached = self._unique.get(video_id)
+        if cached is None or time.monotonic() - cached[1] > self.max_staleness:
+            data = await self.backend.fetch_sketch(video_id)
+            sketch = HyperLogLog.from_bytes(data) if data else HyperLogLog(self.sketch_precision)
+            self._store(self._unique, video_id, sketch)
+        else:
+            sketch = cached[0]
+        # Unions are idempotent, so a sketch counted both here and in the durable one is harmless
+        local = [
+            pending for pending in (self._viewers_in_flight.get(video_id), self._viewers.get(video_id))
+            if pending is not None
+        ]
+        if local:
+            sketch = sketch.copy()
+            for pending in local:
+                sketch.merge(pending)
+        return sketch.count()
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self.backend.close()
@@ -0,0 +1,75 @@
+import hashlib
+import math
+from typing import Iterable, Optional
+
+# 2^-rank for every possible register value, so count() is a table lookup per register
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2^precision bytes.
+
+    The standard error is 1.04 / sqrt(2^precision): about 1.6% with the default precision 12
+    (4 KB per sketch), so 95% of estimates fall within roughly +-3.3% of the true count. Around
+    2.5 * 2^precision items (where it switches from linear counting) the error is up to ~2.5%.
+    Sketches merge losslessly (register-wise max), so workers can each count and combine later.
+    """
+
+    def __init__(self, precision: int = 12, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError("register count does not match precision")
+
+    @staticmethod
+    def _hash(item: str) -> int:
+        return int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns True if the sketch changed"""
+        value = self._hash(item)
+        index = value >> (64 - self.precision)
+        # Rank: position of the first 1 bit in the remaining 64 - precision bits
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def count(self) -> int:
+        """Estimated number of distinct items added"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / math.fsum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        if estimate <= 2.5 * m:
+            # Small range correction: linear counting while registers are still empty
+            zeros = self.registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union in place: afterwards this sketch counts items added to either"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision, self.registers)
+
+    def to_bytes(self) -> bytes:
+        """Serialized form: one precision byte followed by the registers"""
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(data[0], data[1:])
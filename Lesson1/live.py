@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from .counters import CounterStore, Totals
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One live connection: a slot holding only the newest unsent frame, drained by a single sender"""
+
+    def __init__(self, send: Callable[[str], Awaitable[None]]):
+        self.send = send
+        self.dropped = 0
+        self._frame: Optional[str] = None
+        self._ready = asyncio.Event()
+
+    def offer(self, frame: str) -> None:
+        """Replace the pending frame; a slow client skips straight to the latest totals"""
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._ready.set()
+
+    async def run(self) -> None:
+        """Send frames as they arrive until sending fails (the client went away)"""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                await self.send(frame)
+
+
+class LiveCounts:
+    """Pushes like/view totals to subscribers of a video at most once per interval.
+
+    Increments only mark a video dirty; a single ticker encodes one frame per dirty video and
+    offers it to every subscriber. Subscribed videos are also re-read every refresh seconds,
+    so increments made by other workers reach this worker's subscribers too.
+    """
+
+    def __init__(self, counters: CounterStore, interval: float = 0.25, refresh: float = 1.0):
+        self.counters = counters
+        self.interval = interval
+        self.refresh = refresh
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._dirty: Set[int] = set()
+        self._sent: Dict[int, Totals] = {}
+        self._refreshed = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, video_id: int) -> None:
+        if video_id in self._subscribers:
+            self._dirty.add(video_id)
+
+    async def subscribe(self, video_id: int, send: Callable[[str], Awaitable[None]]) -> Subscriber:
+        subscriber = Subscriber(send)
+        self._subscribers.setdefault(video_id, set()).add(subscriber)
+        # A new subscriber starts from the current totals instead of waiting for the next change
+        subscriber.offer(self._frame(video_id, await self.counters.totals(video_id)))
+        return subscriber
+
+    def unsubscribe(self, video_id: int, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(video_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[video_id]
+            self._sent.pop(video_id, None)
+
+    @staticmethod
+    def _frame(video_id: int, totals: Totals) -> str:
+        return json.dumps({"video_id": video_id, "total_likes": totals[0], "total_views": totals[1]})
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.error(f"Failed to publish live counts: {str(e)}")
+
+    async def publish(self) -> None:
+        """Offer the latest totals of every changed video to its subscribers"""
+        dirty, self._dirty = self._dirty, set()
+        now = time.monotonic()
+        if now - self._refreshed >= self.refresh:
+            self._refreshed = now
+            dirty.update(self._subscribers)
+
+        # One batched read for every dirty video, then no awaits while frames are handed out
+        current = await self.counters.totals_many([video_id for video_id in dirty if video_id in self._subscribers])
+        for video_id, totals in current.items():
+            if video_id not in self._subscribers:
+                continue
+            if self._sent.get(video_id) == totals:
+                continue
+            self._sent[video_id] = totals
+            # Encoded once per video, however many subscribers it has
+            frame = self._frame(video_id, totals)
+            for subscriber in tuple(self._subscribers.get(video_id, ())):
+                subscriber.offer(frame)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
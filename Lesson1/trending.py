@@ -0,0 +1,80 @@
+import heapq
+import math
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+class TrendingTracker:
+    """Approximate top videos by exponentially decayed score, in memory bounded by capacity.
+
+    Scores use forward decay: a hit at time t adds weight * e^(rate * (t - landmark)), so stored
+    scores never have to be decayed in place and stay comparable with each other. Only the
+    `capacity` best videos are tracked (Space-Saving): a new video evicts the lowest one and
+    inherits its score, which bounds how much any reported score can be overestimated.
+    """
+
+    def __init__(self, half_life: float, capacity: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self.rate = math.log(2) / half_life
+        self.capacity = capacity
+        self._clock = clock
+        self._landmark = clock()
+        self._scores: Dict[int, float] = {}
+        # Lazy min-heap: an entry is current only while it matches _scores, older ones are skipped
+        self._heap: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def add(self, video_id: int, weight: float = 1.0) -> None:
+        now = self._clock()
+        exponent = self.rate * (now - self._landmark)
+        if exponent > 300:
+            # Move the landmark before e^exponent overflows a float
+            self._rescale(now)
+            exponent = 0.0
+
+        score = self._scores.get(video_id)
+        if score is None:
+            score = self._evict_min() if len(self._scores) >= self.capacity else 0.0
+        score += weight * math.exp(exponent)
+        self._scores[video_id] = score
+        heapq.heappush(self._heap, (score, video_id))
+        if len(self._heap) > 4 * self.capacity:
+            self._compact()
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        """Best `limit` videos as (video_id, score), the score decayed to the current time"""
+        decay = math.exp(-self.rate * (self._clock() - self._landmark))
+        best = heapq.nlargest(limit, self._scores.items(), key=lambda item: item[1])
+        return [(video_id, score * decay) for video_id, score in best]
+
+    def _evict_min(self) -> float:
+        while True:
+            score, video_id = heapq.heappop(self._heap)
+            if self._scores.get(video_id) == score:
+                del self._scores[video_id]
+                return score
+
+    def _compact(self) -> None:
+        self._heap = [(score, video_id) for video_id, score in self._scores.items()]
+        heapq.heapify(self._heap)
+
+    def _rescale(self, now: float) -> None:
+        factor = math.exp(-self.rate * (now - self._landmark))
+        self._scores = {video_id: score * factor for video_id, score in self._scores.items()}
+        self._landmark = now
+        self._compact()
+
+
+class TrendingVideos:
+    """One tracker per named window; the window is the half-life of a like or view's weight"""
+
+    def __init__(self, windows: Dict[str, float], capacity: int = 1000):
+        self.trackers = {name: TrendingTracker(half_life, capacity) for name, half_life in windows.items()}
+
+    def record(self, video_id: int, weight: float = 1.0) -> None:
+        for tracker in self.trackers.values():
+            tracker.add(video_id, weight)
+
+    def top(self, window: str, limit: int) -> List[Tuple[int, float]]:
+        return self.trackers[window].top(limit)
@@ -1,31 +1,106 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
 
-app = FastAPI()
+import asyncio
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 
-videos = {}
+from .counters import CounterStore, MemoryCounterBackend, PostgresCounterBackend
+from .trending import TrendingVideos
+from .live import LiveCounts
+
+# Bir nechta worker uchun umumiy hisoblagichlar: VIDEO_COUNTERS_DB_URL berilsa Postgres, bo'lmasa xotira
+COUNTERS_DB_URL = os.getenv("VIDEO_COUNTERS_DB_URL")
+# Hisoblagichlar bazasiga bir vaqtda ochiq ulanishlar soni (har bir worker uchun)
+COUNTERS_POOL_SIZE = int(os.getenv("VIDEO_COUNTERS_POOL_SIZE", "4"))
+counters = CounterStore(
+    PostgresCounterBackend(COUNTERS_DB_URL, pool_size=COUNTERS_POOL_SIZE) if COUNTERS_DB_URL else MemoryCounterBackend(),
+    flush_interval=float(os.getenv("VIDEO_COUNTERS_FLUSH_INTERVAL", "0.2")),
+    max_staleness=float(os.getenv("VIDEO_COUNTERS_MAX_STALENESS", "1.0")),
+)
+
+# Trend oynalari: like yoki ko'rishning og'irligi shu vaqt ichida ikki baravar kamayadi (half-life, soniya)
+TRENDING_WINDOWS = {"1h": 3600, "24h": 86400, "7d": 604800}
+LIKE_WEIGHT = float(os.getenv("TRENDING_LIKE_WEIGHT", "5"))
+VIEW_WEIGHT = float(os.getenv("TRENDING_VIEW_WEIGHT", "1"))
+trending = TrendingVideos(TRENDING_WINDOWS, capacity=int(os.getenv("TRENDING_CAPACITY", "1000")))
+
+# Jonli hisoblagichlar: har bir video uchun ko'pi bilan VIDEO_LIVE_INTERVAL_MS da bitta yangilanish
+live = LiveCounts(
+    counters,
+    interval=float(os.getenv("VIDEO_LIVE_INTERVAL_MS", "250")) / 1000,
+    refresh=float(os.getenv("VIDEO_COUNTERS_MAX_STALENESS", "1.0")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await counters.start()
+    await live.start()
+    yield
+    await live.stop()
+    await counters.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/api/user/{video_id}/like")
 async def like_video(video_id: int):
-    if video_id not in videos:
-        videos[video_id] = {"likes": 0, "views": 0}
-    
-    videos[video_id]["likes"] += 1
+    counters.incr(video_id, likes=1)
+    trending.record(video_id, LIKE_WEIGHT)
+    live.touch(video_id)
+    likes, _ = await counters.totals(video_id)
     
     return {
         "message": "Video yoqdi",
         "video_id": video_id,
-        "total_likes": videos[video_id]["likes"]
+        "total_likes": likes
     }
 
 @app.post("/api/user/{video_id}/viewer")
-async def view_video(video_id: int):
-    if video_id not in videos:
-        videos[video_id] = {"likes": 0, "views": 0}
+async def view_video(video_id: int, viewer_id: Optional[str] = None):
+    counters.incr(video_id, views=1)
+    trending.record(video_id, VIEW_WEIGHT)
+    live.touch(video_id)
+    _, views = await counters.totals(video_id)
     
-    videos[video_id]["views"] += 1
-    
-    return {
+    response = {
         "message": "Video ko'rildi",
         "video_id": video_id,
-        "total_views": videos[video_id]["views"]
+        "total_views": views
+    }
+    # viewer_id berilsa, takrorlanmas ko'ruvchilar ham taxminan sanaladi (HyperLogLog, ~1.6% xato)
+    if viewer_id:
+        counters.add_viewer(video_id, viewer_id)
+        response["unique_views"] = await counters.unique_views(video_id)
+    return response
+
+@app.get("/api/videos/trending")
+async def trending_videos(window: str = "24h", limit: int = Query(50, ge=1, le=100)):
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Noto'g'ri oyna, mumkin bo'lganlari: {', '.join(TRENDING_WINDOWS)}"
+        )
+    return {
+        "window": window,
+        "videos": [
+            {"video_id": video_id, "score": round(score, 3)}
+            for video_id, score in trending.top(window, limit)
+        ]
     }
+
+@app.websocket("/ws/videos/{video_id}")
+async def video_counts(websocket: WebSocket, video_id: int):
+    await websocket.accept()
+    subscriber = await live.subscribe(video_id, websocket.send_text)
+    # Bitta yuboruvchi task; bu yerda faqat mijoz uzilganini kutamiz
+    sender = asyncio.create_task(subscriber.run())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live.unsubscribe(video_id, subscriber)
+        sender.cancel()
+        with suppress(Exception, asyncio.CancelledError):
+            await sender
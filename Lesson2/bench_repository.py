@@ -0,0 +1,53 @@
+"""Per-operation latency of UserRepository as the store grows.
+
+    python -m Lesson2.bench_repository --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from .hw import User, UserCreate
+from .repository import UserRepository
+
+
+def fill(repo: UserRepository, count: int) -> None:
+    for index in range(len(repo), count):
+        repo.create(UserCreate.model_construct(name=f"user{index}", email=f"fill{index}@example.com", age=None))
+
+
+def per_op(func, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main(sizes, operations: int) -> None:
+    repo = UserRepository(User)
+    print(f"{'users':>10}{'get':>10}{'update':>10}{'delete':>10}{'create':>10}  (us/op)")
+    for size in sizes:
+        fill(repo, size)
+        ids = random.sample(list(repo._users), min(operations, size))
+        updates = [
+            (user_id, UserCreate.model_construct(name="renamed", email=repo.get(user_id).email, age=30))
+            for user_id in ids
+        ]
+        creates = [
+            UserCreate.model_construct(name="again", email=f"again{size}_{user_id}@example.com", age=None)
+            for user_id in ids
+        ]
+
+        get = per_op(repo.get, ids)
+        update = per_op(lambda item: repo.update(*item), updates)
+        delete = per_op(repo.delete, ids)
+        # Re-create as many users as were deleted so the store keeps its size
+        create = per_op(repo.create, creates)
+        print(f"{size:>10}{get:>10.2f}{update:>10.2f}{delete:>10.2f}{create:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--operations", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.sizes, args.operations)
@@ -1,8 +1,11 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 
-app = FastAPI()
+from .repository import UserRepository, DuplicateEmailError
 
 class UserCreate(BaseModel):
     name: str
@@ -12,36 +15,43 @@ class UserCreate(BaseModel):
 class User(UserCreate):
     id: int
 
-users = []
-next_id = 1  
+# USERS_SNAPSHOT_PATH berilsa, foydalanuvchilar qayta ishga tushirishda tiklanadi
+users = UserRepository(User, snapshot_path=os.getenv("USERS_SNAPSHOT_PATH"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    users.load()
+    yield
+    users.save()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/users/", response_model=User)
 def create_user(user: UserCreate):
-    global next_id
-    new_user = User(id=next_id, **user.dict())
-    next_id += 1
-    users.append(new_user)
-    return new_user
+    try:
+        return users.create(user)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=400, detail="Bu email allaqachon mavjud")
 
 @app.get("/users/{user_id}", response_model=User)
 def get_user(user_id: int):
-    for user in users:
-        if user.id == user_id:
-            return user
-    raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
+    user = users.get(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
+    return user
 
 @app.put("/users/{user_id}", response_model=User)
 def update_user(user_id: int, updated_user: UserCreate):
-    for index, user in enumerate(users):
-        if user.id == user_id:
-            users[index] = User(id=user_id, **updated_user.dict())
-            return users[index]
-    raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
+    try:
+        user = users.update(user_id, updated_user)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=400, detail="Bu email allaqachon mavjud")
+    if user is None:
+        raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
+    return user
 
 @app.delete("/users/{user_id}")
 def delete_user(user_id: int):
-    for index, user in enumerate(users):
-        if user.id == user_id:
-            del users[index]
-            return {"message": "Foydalanuvchi o'chirildi"}
-    raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
\ No newline at end of file
+    if not users.delete(user_id):
+        raise HTTPException(status_code=404, detail="Foydalanuvchi topilmadi")
+    return {"message": "Foydalanuvchi o'chirildi"}
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+from typing import Dict, Generic, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when another user already has the email"""
+    pass
+
+
+class UserRepository(Generic[M]):
+    """In-memory user store: dict by id plus a unique email index, safe to use from threadpool handlers"""
+
+    def __init__(self, model: Type[M], snapshot_path: Optional[str] = None):
+        self.model = model
+        self.snapshot_path = snapshot_path
+        self._users: Dict[int, M] = {}
+        self._ids_by_email: Dict[str, int] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return email.lower()
+
+    def create(self, data: BaseModel) -> M:
+        fields = data.model_dump()
+        email = self._email_key(fields["email"])
+        with self._lock:
+            if email in self._ids_by_email:
+                raise DuplicateEmailError(fields["email"])
+            user_id = self._next_id
+            self._next_id += 1
+            # data is already validated, so skip a second validation pass
+            user = self.model.model_construct(id=user_id, **fields)
+            self._users[user_id] = user
+            self._ids_by_email[email] = user_id
+            return user
+
+    def get(self, user_id: int) -> Optional[M]:
+        return self._users.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[M]:
+        user_id = self._ids_by_email.get(self._email_key(email))
+        return self._users.get(user_id) if user_id is not None else None
+
+    def update(self, user_id: int, data: BaseModel) -> Optional[M]:
+        fields = data.model_dump()
+        email = self._email_key(fields["email"])
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None:
+                return None
+            owner = self._ids_by_email.get(email)
+            if owner is not None and owner != user_id:
+                raise DuplicateEmailError(fields["email"])
+            del self._ids_by_email[self._email_key(current.email)]
+            user = self.model.model_construct(id=user_id, **fields)
+            self._users[user_id] = user
+            self._ids_by_email[email] = user_id
+            return user
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock:
+            user = self._users.pop(user_id, None)
+            if user is None:
+                return False
+            del self._ids_by_email[self._email_key(user.email)]
+            return True
+
+    def save(self) -> None:
+        """Write all users to the snapshot file atomically"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            snapshot = {
+                "next_id": self._next_id,
+                "users": [user.model_dump() for user in self._users.values()],
+            }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load(self) -> None:
+        """Restore users from the snapshot file if it exists"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        users: List[M] = [self.model(**item) for item in snapshot["users"]]
+        with self._lock:
+            self._users = {user.id: user for user in users}
+            self._ids_by_email = {self._email_key(user.email): user.id for user in users}
+            self._next_id = max(snapshot["next_id"], max(self._users, default=0) + 1)
@@ -1,54 +1,111 @@
-import psycopg2
+import threading
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+
+# Parol hech qachon ro'yxatlarga olinmaydi
+USER_COLUMNS = "id, fullname, username, email"
 
 class Database:
-    def __init__(self):
-        self.connection = psycopg2.connect(
+    def __init__(self, minconn=1, maxconn=20):
+        self.pool = ThreadedConnectionPool(
+            minconn,
+            maxconn,
             database="fastapi",
             user="postgres",
             password="1",
             host="localhost",
             port=5432
         )
-        self.cursor = self.connection.cursor()
+        # getconn() fails instead of waiting when the pool is empty, so callers queue here
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def cursor(self):
+        """Check out a connection for one unit of work; commits on success, rolls back on error"""
+        with self._slots:
+            connection = self.pool.getconn()
+            try:
+                with connection:
+                    with connection.cursor() as cursor:
+                        yield cursor
+            finally:
+                self.pool.putconn(connection)
+
+    def close(self):
+        self.pool.closeall()
 
     # def create_table(self):
-    #     self.cursor.execute("""
-    #     CREATE TABLE IF NOT EXISTS users (
-    #         id SERIAL PRIMARY KEY,
-    #         fullname VARCHAR(255) NOT NULL,
-    #         username VARCHAR(100) UNIQUE NOT NULL,
-    #         email VARCHAR(255) UNIQUE NOT NULL,
-    #         password VARCHAR(255) NOT NULL
-    #     )
-    #     """)
-    #     self.connection.commit()
+    #     with self.cursor() as cursor:
+    #         cursor.execute("""
+    #         CREATE TABLE IF NOT EXISTS users (
+    #             id SERIAL PRIMARY KEY,
+    #             fullname VARCHAR(255) NOT NULL,
+    #             username VARCHAR(100) UNIQUE NOT NULL,
+    #             email VARCHAR(255) UNIQUE NOT NULL,
+    #             password VARCHAR(255) NOT NULL
+    #         )
+    #         """)
 
     def add_user(self, fullname, username, email, password):
-        self.cursor.execute(
-            "INSERT INTO users (fullname, username, email, password) VALUES (%s, %s, %s, %s)",
-            (fullname, username, email, password)
-        )
-        self.connection.commit()  
-
+        with self.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (fullname, username, email, password) VALUES (%s, %s, %s, %s) RETURNING id",
+                (fullname, username, email, password)
+            )
+            return cursor.fetchone()[0]
 
     def get_all_users(self):
-        self.cursor.execute("SELECT * FROM users")
-        users = self.cursor.fetchall()
-        return users
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT {USER_COLUMNS} FROM users ORDER BY id")
+            return cursor.fetchall()
+
+    def get_users(self, limit=50, offset=0, after_id=None):
+        """One page of users by id; after_id (keyset) avoids scanning the skipped rows that offset needs"""
+        with self.cursor() as cursor:
+            if after_id is not None:
+                cursor.execute(
+                    f"SELECT {USER_COLUMNS} FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                    (after_id, limit)
+                )
+            else:
+                cursor.execute(
+                    f"SELECT {USER_COLUMNS} FROM users ORDER BY id LIMIT %s OFFSET %s",
+                    (limit, offset)
+                )
+            return cursor.fetchall()
+
+    def iter_users(self, batch_size=1000):
+        """Yield every user through a server-side named cursor, batch_size rows per round trip"""
+        with self._slots:
+            connection = self.pool.getconn()
+            try:
+                with connection:
+                    with connection.cursor(name="users_export") as cursor:
+                        cursor.itersize = batch_size
+                        cursor.execute(f"SELECT {USER_COLUMNS} FROM users ORDER BY id")
+                        yield from cursor
+            finally:
+                self.pool.putconn(connection)
 
     def get_user(self, user_id):
-        self.cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        return self.cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,))
+            return cursor.fetchone()
 
     def update_user(self, user_id, fullname, username, email, password):
-        self.cursor.execute("""
-            UPDATE users 
-            SET fullname = %s, username = %s, email = %s, password = %s
-            WHERE id = %s
-        """, (fullname, username, email, password, user_id))
-        self.connection.commit()
-        return True
+        """Update in one round trip; returns the updated row or None if the user does not exist"""
+        with self.cursor() as cursor:
+            cursor.execute("""
+                UPDATE users 
+                SET fullname = %s, username = %s, email = %s, password = %s
+                WHERE id = %s
+                RETURNING id, fullname, username, email
+            """, (fullname, username, email, password, user_id))
+            return cursor.fetchone()
 
     def delete_user(self, user_id):
-        self.cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        self.connection.commit()
+        """Delete in one round trip; returns False if the user does not exist"""
+        with self.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE id = %s RETURNING id", (user_id,))
+            return cursor.fetchone() is not None
@@ -1,45 +1,69 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from .models import User, BaseResponseModel
 from .database import Database
 
-app = FastAPI()
 db = Database()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Handlerlar oddiy "def": FastAPI ularni threadpool'da ishlatadi, psycopg2 event loop'ni bloklamaydi
+
 # ------------------------------- POST --------------------------------
 @app.post("/user/")
-async def create_user(user: User):
+def create_user(user: User):
     user_id = db.add_user(user.fullname, user.username, user.email, user.password)
     user_data = user.dict()
     user_data["id"] = user_id
     return BaseResponseModel(success=True, data=user_data)
 
 # ------------------------------- GET --------------------------------
+def user_row(u):
+    return {"id": u[0], "fullname": u[1], "username": u[2], "email": u[3]}
+
+def ndjson_users(rows):
+    for u in rows:
+        yield json.dumps(user_row(u)) + "\n"
+
 @app.get("/users/")
-async def read_users():
-    users = db.get_all_users()
-    user_list = [
-        {"id": u[0], "fullname": u[1], "username": u[2], "email": u[3], "password": u[4]}
-        for u in users
-    ]
+def read_users(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    after_id: Optional[int] = None,
+    stream: bool = False
+):
+    if stream:
+        # Server-side cursor: xotira jadval hajmidan qat'i nazar bir xil qoladi
+        return StreamingResponse(ndjson_users(db.iter_users()), media_type="application/x-ndjson")
+
+    users = db.get_users(limit=limit, offset=offset, after_id=after_id)
+    user_list = [user_row(u) for u in users]
+    if len(user_list) == limit:
+        response.headers["X-Next-After-Id"] = str(user_list[-1]["id"])
     return BaseResponseModel(success=True, data=user_list)
 
 # ------------------------------- PUT --------------------------------
 @app.put("/user/{user_id}")
-async def update_user(user_id: int, user: User):
-    existing_user = db.get_user(user_id)
-    if not existing_user:
+def update_user(user_id: int, user: User):
+    updated_user = db.update_user(user_id, user.fullname, user.username, user.email, user.password)
+    if not updated_user:
         return BaseResponseModel(success=False, errors=[{"message": "User not found"}])
 
-    db.update_user(user_id, user.fullname, user.username, user.email, user.password)
     return BaseResponseModel(success=True, data={**user.dict(), "id": user_id})
 
 # ------------------------------- Delete --------------------------------
 @app.delete("/user/{user_id}")
-async def delete_user(user_id: int):
-    existing_user = db.get_user(user_id)
-    if not existing_user:
+def delete_user(user_id: int):
+    if not db.delete_user(user_id):
         return BaseResponseModel(success=False, errors=[{"message": "User not found"}])
     
-    db.delete_user(user_id)
     return BaseResponseModel(success=True, data={"message": "User deleted"})
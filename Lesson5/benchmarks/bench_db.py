@@ -0,0 +1,88 @@
+"""Micro-benchmark of Database methods alone, without HTTP.
+
+    python benchmarks/bench_db.py --iterations 500 --concurrency 20 --save db.json --baseline db_baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import Recorder, compare_to_baseline, print_summary, save_summary
+from config import DB_URL, HASH_QUEUE_SIZE, HASH_WORKERS
+from db import Database
+from hashing import PasswordHasher
+
+PASSWORD = "benchmark-password"
+
+
+async def run(args) -> bool:
+    db = Database(DB_URL, hasher=PasswordHasher(HASH_WORKERS, HASH_QUEUE_SIZE))
+    await db.initialize()
+    prefix = f"bd{uuid.uuid4().hex[:6]}_"
+    counter = itertools.count()
+    ids = []
+    recorder = Recorder()
+
+    def new_username() -> str:
+        return f"{prefix}{next(counter)}"
+
+    async def add() -> None:
+        username = new_username()
+        user = await db.add(f"Bench {username}", username, f"{username}@example.com", PASSWORD)
+        ids.append(user["id"])
+
+    operations = {
+        "add": add,
+        "get_by_id": lambda: db.get_by_id(random.choice(ids)),
+        "page": lambda: db.page(limit=50),
+        "update": lambda: db.update(random.choice(ids), full_name="Renamed"),
+        "verify_password": lambda: db.verify_password(f"{prefix}0", PASSWORD),
+        "update_last_login": lambda: db.update_last_login(f"{prefix}0"),
+    }
+
+    try:
+        # Everything below needs at least one user
+        await add()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(name: str) -> None:
+            async with semaphore:
+                async with recorder.measure(name):
+                    await operations[name]()
+
+        for name in args.operations or operations:
+            await asyncio.gather(*(one(name) for _ in range(args.iterations)))
+
+        # delete last so the other operations always find users
+        async def delete() -> None:
+            await db.delete(ids.pop())
+
+        operations["delete"] = delete
+        await asyncio.gather(*(one("delete") for _ in range(min(args.iterations, len(ids)))))
+        recorder.stop()
+    finally:
+        await db.close()
+
+    summary = recorder.summary()
+    print_summary(summary)
+    if args.save:
+        save_summary(summary, args.save)
+    if args.baseline:
+        return compare_to_baseline(summary, args.baseline, args.max_regression)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500, help="calls per operation")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--operations", nargs="*", help="subset of operations to run")
+    parser.add_argument("--save", help="write the summary as JSON")
+    parser.add_argument("--baseline", help="compare against a saved summary")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed p95 increase (0.10 = 10%%)")
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
@@ -0,0 +1,75 @@
+"""Serialization cost of the user list response: FastAPI's default path vs. serializers.dump_list.
+
+No database is needed; rows are synthetic dicts shaped like the users query result.
+
+    python benchmarks/bench_serialization.py --rows 1000 10000 100000
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import serializers
+from router.user import UserResponse
+
+
+def make_rows(count: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": index,
+            "full_name": f"User Number {index}",
+            "username": f"user_{index}",
+            "email": f"user_{index}@example.com",
+            "created_at": now - timedelta(seconds=index),
+            "updated_at": now,
+            "is_active": True,
+        }
+        for index in range(count)
+    ]
+
+
+RESPONSE_ADAPTER = TypeAdapter(List[UserResponse])
+
+
+def fastapi_default(rows: List[dict]) -> bytes:
+    """What FastAPI does for response_model=List[UserResponse]: validate, encode, json.dumps"""
+    validated = RESPONSE_ADAPTER.validate_python(rows)
+    content = jsonable_encoder(RESPONSE_ADAPTER.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def timed(func: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    backend = "orjson" if serializers.orjson is not None else "pydantic TypeAdapter"
+    print(f"fast path backend: {backend}\n")
+    print(f"{'rows':>8}{'default':>14}{'fast':>14}{'speedup':>10}")
+    for size in sizes:
+        rows = make_rows(size)
+        default = timed(lambda: fastapi_default(rows), repeat)
+        fast = timed(lambda: serializers.dump_list(rows, UserResponse), repeat)
+        print(f"{size:>8}{default * 1000:>12.2f}ms{fast * 1000:>12.2f}ms{default / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,151 @@
+"""Per-query latency of the statement registry vs. the SQL Database sent before it.
+
+Both sides go through a pool with asyncpg's default statement cache, checking a connection out
+and releasing it per call as Database does. The "baseline" side sends the original inline SQL and
+builds UPDATE statements field by field; the "registry" side runs the named statements. asyncpg
+already prepared the baseline's texts once per connection, so expect the two to match: this checks
+that the registry costs nothing, not that it is faster.
+
+Usage (from the Lesson5 directory, against a database created by the app):
+
+    python benchmarks/bench_statements.py --iterations 2000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncpg
+
+from config import DB_URL
+from statements import PreparedConnection, update_statement_name
+
+BENCH_USERNAME = "bench_statements"
+UPDATE_SHAPES = [
+    ("full_name",), ("email",), ("password",),
+    ("full_name", "email"), ("full_name", "password"), ("email", "password"),
+    ("full_name", "email", "password"),
+]
+
+# The queries as Database sent them inline before the registry
+BASELINE_SQL = {
+    "get_by_id": """
+        SELECT id, full_name, username, email, created_at, updated_at, is_active
+        FROM users
+        WHERE id = $1 AND is_active = TRUE
+    """,
+    "verify_password": """
+        SELECT password
+        FROM users
+        WHERE username = $1 AND is_active = TRUE
+    """,
+}
+
+
+def baseline_update(fields: Dict[str, str]) -> str:
+    """The UPDATE Database.update built per call before the registry"""
+    updates = [f"{name} = ${index}" for index, name in enumerate(fields, start=1)]
+    return f"""
+        UPDATE users
+        SET {', '.join(updates)}
+        WHERE id = ${len(updates) + 1} AND is_active = TRUE
+        RETURNING id, full_name, username, email, created_at, updated_at, is_active
+    """
+
+
+def field_values(shape) -> Dict[str, str]:
+    values = {
+        "full_name": "Bench User",
+        "email": f"{BENCH_USERNAME}@example.com",
+        "password": "x" * 60,
+    }
+    return {name: values[name] for name in shape}
+
+
+async def seed(pool: asyncpg.Pool) -> int:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO users (full_name, username, email, password)
+            VALUES ('Bench User', $1, $2, 'x')
+            ON CONFLICT (username) DO UPDATE SET is_active = TRUE
+            """,
+            BENCH_USERNAME, f"{BENCH_USERNAME}@example.com"
+        )
+        return await conn.fetchval("SELECT id FROM users WHERE username = $1", BENCH_USERNAME)
+
+
+async def measure(call: Callable, iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def checkout(pool: asyncpg.Pool, method: str, query: str, *args) -> Callable:
+    """One checkout plus one query, the way Database runs it"""
+    async def call():
+        async with pool.acquire() as conn:
+            return await getattr(conn, method)(query, *args)
+    return call
+
+
+def report(results: Dict[str, Dict[str, List[float]]]) -> None:
+    print(f"{'query':<36}{'base p50':>12}{'reg p50':>12}{'base p99':>12}{'reg p99':>12}")
+    for name, modes in results.items():
+        row = [name]
+        for percentile in (50, 99):
+            for mode in ("baseline", "registry"):
+                timings = sorted(modes[mode])
+                value = timings[min(len(timings) - 1, len(timings) * percentile // 100)]
+                row.append(f"{value * 1e6:.0f}us")
+        print(f"{row[0]:<36}{row[1]:>12}{row[2]:>12}{row[3]:>12}{row[4]:>12}")
+    total_baseline = sum(statistics.fmean(modes["baseline"]) for modes in results.values())
+    total_registry = sum(statistics.fmean(modes["registry"]) for modes in results.values())
+    print(f"\nmean per query: baseline {total_baseline / len(results) * 1e6:.0f}us, "
+          f"registry {total_registry / len(results) * 1e6:.0f}us")
+
+
+async def main(iterations: int) -> None:
+    baseline = await asyncpg.create_pool(DB_URL, min_size=1, max_size=1)
+    registry = await asyncpg.create_pool(DB_URL, min_size=1, max_size=1, connection_class=PreparedConnection)
+    try:
+        user_id = await seed(registry)
+        fixed = {"get_by_id": (user_id,), "verify_password": (BENCH_USERNAME,)}
+        results: Dict[str, Dict[str, List[float]]] = {}
+
+        for name, args in fixed.items():
+            results[name] = {
+                "baseline": await measure(checkout(baseline, "fetch", BASELINE_SQL[name], *args), iterations),
+                "registry": await measure(checkout(registry, "fetch_named", name, *args), iterations),
+            }
+
+        # Rotate through all update shapes the way mixed PUT traffic does
+        for shape in UPDATE_SHAPES:
+            fields = field_values(shape)
+            name = update_statement_name(shape)
+            args = (*fields.values(), user_id)
+            results[name] = {
+                "baseline": await measure(checkout(baseline, "fetchrow", baseline_update(fields), *args), iterations),
+                "registry": await measure(checkout(registry, "fetchrow_named", name, *args), iterations),
+            }
+
+        report(results)
+    finally:
+        async with registry.acquire() as conn:
+            await conn.execute("DELETE FROM users WHERE username = $1", BENCH_USERNAME)
+        await baseline.close()
+        await registry.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,88 @@
+import json
+import math
+import statistics
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Collects per-operation latencies and errors for one benchmark run"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @asynccontextmanager
+    async def measure(self, operation: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors[operation] += 1
+        else:
+            self.latencies[operation].append(time.perf_counter() - started)
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        result = {}
+        for operation in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(operation, []))
+            result[operation] = {
+                "count": len(values),
+                "errors": self.errors.get(operation, 0),
+                "throughput": len(values) / elapsed if elapsed else 0.0,
+                "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return result
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'operation':<18}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, stats in summary.items():
+        print(
+            f"{operation:<18}{stats['count']:>8}{stats['errors']:>8}{stats['throughput']:>10.1f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+
+
+def save_summary(summary: Dict[str, Dict[str, float]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+
+def compare_to_baseline(summary: Dict[str, Dict[str, float]], path: str, max_regression: float) -> bool:
+    """Print p95 changes against a saved run; False if any operation got slower than allowed"""
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    ok = True
+    print(f"\n{'operation':<18}{'baseline p95':>14}{'current p95':>14}{'change':>10}")
+    for operation, stats in summary.items():
+        previous = baseline.get(operation)
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = stats["p95_ms"] / previous["p95_ms"] - 1
+        flag = ""
+        if change > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"{operation:<18}{previous['p95_ms']:>14.2f}{stats['p95_ms']:>14.2f}{change:>+9.0%}{flag}")
+    return ok
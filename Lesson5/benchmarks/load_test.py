@@ -0,0 +1,183 @@
+"""Load test for the Lesson5 user API: seeds users, then drives a weighted mix of requests.
+
+Against a running server:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 1000 --concurrency 50 --duration 30
+
+In-process, starting the app lifespan against the DB_* settings from the environment / .env,
+for example a disposable cluster:
+
+    docker run --rm -d -e POSTGRES_PASSWORD=1 -e POSTGRES_DB=fastapi -p 5432:5432 postgres:16
+    python benchmarks/load_test.py --in-process --users 1000
+
+The login operation is rate limited per username and per client IP; raise LOGIN_USER_RATE,
+LOGIN_IP_RATE and their bursts on the server when it is part of the mix.
+
+Per-commit regression gate (exit code 1 when any operation's p95 regressed too much):
+
+    python benchmarks/load_test.py --in-process --save current.json --baseline baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from common import Recorder, compare_to_baseline, print_summary, save_summary
+
+DEFAULT_MIX = "create=1,list=4,get=10,update=2,delete=1"
+PASSWORD = "benchmark-password"
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+        self.prefix = f"lt{uuid.uuid4().hex[:6]}_"
+        self.counter = itertools.count()
+        self.ids: List[int] = []
+        self.usernames: Dict[int, str] = {}
+
+    def new_user(self) -> Dict[str, str]:
+        username = f"{self.prefix}{next(self.counter)}"
+        return {
+            "full_name": f"Load Test {username}",
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": PASSWORD,
+        }
+
+    async def seed(self, count: int, batch_size: int = 1000) -> None:
+        """Bulk-create users, then collect their ids from the list endpoint"""
+        for start in range(0, count, batch_size):
+            users = [self.new_user() for _ in range(min(batch_size, count - start))]
+            response = await self.client.post("/api/users/bulk", json=users, timeout=None)
+            response.raise_for_status()
+
+        after = None
+        while len(self.ids) < count:
+            params = {"limit": 1000, **({"after": after} if after else {})}
+            response = await self.client.get("/api/users/", params=params)
+            response.raise_for_status()
+            page = response.json()
+            for user in page:
+                if user["username"].startswith(self.prefix):
+                    self.ids.append(user["id"])
+                    self.usernames[user["id"]] = user["username"]
+            after = response.headers.get("x-next-cursor")
+            if not after:
+                break
+        print(f"seeded {len(self.ids)} users with prefix {self.prefix}")
+
+    async def create(self) -> None:
+        response = await self.client.post("/api/users/", json=self.new_user())
+        response.raise_for_status()
+        user = response.json()
+        self.ids.append(user["id"])
+        self.usernames[user["id"]] = user["username"]
+
+    async def list(self) -> None:
+        (await self.client.get("/api/users/", params={"limit": 50})).raise_for_status()
+
+    async def get(self) -> None:
+        (await self.client.get(f"/api/users/{random.choice(self.ids)}")).raise_for_status()
+
+    async def update(self) -> None:
+        user_id = random.choice(self.ids)
+        response = await self.client.put(f"/api/users/{user_id}", json={"full_name": f"Renamed {user_id}"})
+        response.raise_for_status()
+
+    async def delete(self) -> None:
+        user_id = self.ids.pop(random.randrange(len(self.ids)))
+        self.usernames.pop(user_id, None)
+        (await self.client.delete(f"/api/users/{user_id}")).raise_for_status()
+
+    async def login(self) -> None:
+        username = self.usernames[random.choice(self.ids)]
+        response = await self.client.post("/api/users/login", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+
+    async def worker(self, weights: Dict[str, int], deadline: float) -> None:
+        names, values = list(weights), list(weights.values())
+        while time.perf_counter() < deadline:
+            operation = random.choices(names, values)[0]
+            if operation in ("get", "update", "delete", "login") and len(self.ids) < 2:
+                operation = "create"
+            async with self.recorder.measure(operation):
+                await getattr(self, operation)()
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    """Poll the readiness endpoint; the app connects and migrates in the background"""
+    deadline = time.perf_counter() + timeout
+    while (await client.get("/health/ready")).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"server not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+
+@contextlib.asynccontextmanager
+async def make_client(args):
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+            yield client
+        return
+
+    import main  # imported late so config picks up the environment of this run
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as client:
+            yield client
+
+
+async def run(args) -> bool:
+    weights = parse_mix(args.mix)
+    async with make_client(args) as client:
+        recorder = Recorder()
+        test = LoadTest(client, recorder)
+        await wait_until_ready(client)
+        await test.seed(args.users)
+
+        recorder.started = time.perf_counter()
+        deadline = recorder.started + args.duration
+        await asyncio.gather(*(test.worker(weights, deadline) for _ in range(args.concurrency)))
+        recorder.stop()
+
+    summary = recorder.summary()
+    print_summary(summary)
+    if args.save:
+        save_summary(summary, args.save)
+    if args.baseline:
+        return compare_to_baseline(summary, args.baseline, args.max_regression)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="run the app inside this process")
+    parser.add_argument("--users", type=int, default=1000, help="users to seed before the run")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--save", help="write the summary as JSON")
+    parser.add_argument("--baseline", help="compare against a saved summary")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed p95 increase (0.10 = 10%%)")
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
@@ -0,0 +1,83 @@
+"""Pick password hash cost parameters that take about --target-ms per hash on this machine.
+
+No database is needed. Run it on the hardware the app is deployed to and copy the printed
+settings into .env:
+
+    python benchmarks/tune_hash.py --target-ms 250
+    python benchmarks/tune_hash.py --scheme bcrypt --target-ms 250
+
+argon2id: memory cost and parallelism are fixed by the flags, time cost is raised until a hash
+takes at least the target. bcrypt: rounds are raised until the target is reached.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from passlib.hash import argon2, bcrypt
+
+PASSWORD = "benchmark-password"
+
+
+def measure(hash_func: Callable[[str], str], samples: int) -> float:
+    """Median seconds per hash"""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hash_func(PASSWORD)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def tune_argon2(target: float, memory_cost: int, parallelism: int, samples: int) -> Tuple[int, float]:
+    time_cost, seconds = 1, 0.0
+    while True:
+        hasher = argon2.using(type="ID", time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        seconds = measure(hasher.hash, samples)
+        print(f"argon2id t={time_cost} m={memory_cost}KiB p={parallelism}: {seconds * 1000:.1f}ms")
+        if seconds >= target or time_cost >= 64:
+            return time_cost, seconds
+        time_cost += 1
+
+
+def tune_bcrypt(target: float, samples: int) -> Tuple[int, float]:
+    rounds, seconds = 10, 0.0
+    while True:
+        seconds = measure(bcrypt.using(rounds=rounds).hash, samples)
+        print(f"bcrypt rounds={rounds}: {seconds * 1000:.1f}ms")
+        if seconds >= target or rounds >= 16:
+            return rounds, seconds
+        rounds += 1
+
+
+def main(args) -> None:
+    target = args.target_ms / 1000
+    if args.scheme == "argon2":
+        time_cost, seconds = tune_argon2(target, args.memory_kib, args.parallelism, args.samples)
+        settings = {
+            "ARGON2_TIME_COST": time_cost,
+            "ARGON2_MEMORY_COST": args.memory_kib,
+            "ARGON2_PARALLELISM": args.parallelism,
+        }
+    else:
+        rounds, seconds = tune_bcrypt(target, args.samples)
+        settings = {"BCRYPT_ROUNDS": rounds}
+
+    # Each hash worker is one process, so throughput scales with HASH_WORKERS
+    print(f"\n{seconds * 1000:.1f}ms per hash, about {1 / seconds:.1f} logins/s per hash worker\n")
+    for name, value in settings.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scheme", choices=("argon2", "bcrypt"), default="argon2")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--memory-kib", type=int, default=65536, help="argon2 memory cost")
+    parser.add_argument("--parallelism", type=int, default=1, help="argon2 lanes")
+    parser.add_argument("--samples", type=int, default=5, help="hashes per setting")
+    main(parser.parse_args())
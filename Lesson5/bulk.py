@@ -0,0 +1,107 @@
+import csv
+import json
+import re
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from fastapi import Request
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+CSV_TYPES = ("text/csv", "application/csv")
+
+# Mirrors of the users table constraints (migration 1)
+USERNAME_MAX_LENGTH = 20
+EMAIL_MAX_LENGTH = 100
+USERNAME_PATTERN = re.compile(r"[a-zA-Z0-9_-]+")
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when the bulk import body is not JSON, NDJSON or CSV"""
+    pass
+
+
+def constraint_error(user: Dict[str, Any]) -> Optional[str]:
+    """Why the users table would reject a validated row, checked up front so it cannot abort a COPY batch"""
+    username, email = user["username"].lower(), user["email"].lower()
+    if len(username) > USERNAME_MAX_LENGTH or not USERNAME_PATTERN.fullmatch(username):
+        return "username: not accepted by the users table"
+    if len(email) > EMAIL_MAX_LENGTH:
+        return f"email: must be at most {EMAIL_MAX_LENGTH} characters"
+    if not EMAIL_PATTERN.fullmatch(email):
+        return "email: not accepted by the users table"
+    return None
+
+
+class LineFeed:
+    """Iterator a csv.reader pulls lines from; filled one record at a time by async code"""
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self) -> "LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    """Yield decoded lines from the request body as it arrives"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def iter_rows(request: Request) -> AsyncIterator[Any]:
+    """Yield raw user objects from a JSON array, NDJSON or CSV request body"""
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_TYPES:
+        async for line in iter_lines(request):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Let validation report the malformed line against its row number
+                yield line
+    elif content_type in CSV_TYPES:
+        # One reader over every line, so quoted fields may span lines. A record is complete once its
+        # quotes balance (escaped quotes come in pairs); only then is the reader asked for it
+        feed = LineFeed()
+        reader = csv.reader(feed)
+        header = None
+        quotes = 0
+        async for line in iter_lines(request):
+            if not feed.lines and not line.strip():
+                continue
+            feed.lines.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            quotes = 0
+            values = next(reader)
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            # Blank cells are left out, so optional columns (password or password_hash) may stay empty
+            yield {name: value for name, value in zip(header, values) if value != ""}
+        if feed.lines:
+            raise ValueError("CSV body ends inside a quoted field")
+    elif content_type == "application/json":
+        # The whole array is parsed in memory before the first row; send large imports as NDJSON or CSV
+        body = await request.json()
+        if not isinstance(body, list):
+            raise UnsupportedFormatError("JSON body must be an array of users")
+        for item in body:
+            yield item
+    else:
+        raise UnsupportedFormatError(f"Unsupported content type: {content_type}")
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+CACHE_HITS = REGISTRY.counter("user_cache_hits_total", "User cache hits", labelnames=("key",))
+CACHE_MISSES = REGISTRY.counter("user_cache_misses_total", "User cache misses", labelnames=("key",))
+CACHE_COALESCED = REGISTRY.counter(
+    "user_cache_coalesced_total",
+    "Lookups that waited on an in-flight load instead of querying the database",
+    labelnames=("key",)
+)
+
+
+class CacheBackend(ABC):
+    """Storage interface for the user cache; shared backends (e.g. Redis) implement the same methods"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class LRUCache(CacheBackend):
+    """In-process LRU cache with a size bound and per-entry TTL"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+Loader = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+ManyLoader = Callable[[List[int]], Awaitable[Dict[int, Dict[str, Any]]]]
+
+
+class UserCache:
+    """Read-through cache of user rows keyed by id and username"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._inflight: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        # Bumped on every invalidation so loads started before it are not stored
+        self._generation = 0
+
+    @staticmethod
+    def id_key(user_id: int) -> str:
+        return f"user:id:{user_id}"
+
+    @staticmethod
+    def username_key(username: str) -> str:
+        return f"user:username:{username.lower()}"
+
+    async def _get(self, kind: str, key: str, loader: Loader) -> Optional[Dict[str, Any]]:
+        cached = await self.backend.get(key)
+        if cached is not None:
+            CACHE_HITS.inc(key=kind)
+            return dict(cached)
+
+        # Coalesce concurrent misses on the same key into a single load
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            CACHE_COALESCED.inc(key=kind)
+            user = await asyncio.shield(inflight)
+            return dict(user) if user else None
+
+        CACHE_MISSES.inc(key=kind)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            user = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; make sure the future never logs "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(user)
+        finally:
+            del self._inflight[key]
+
+        if user is not None and generation == self._generation:
+            await self.store(user)
+        return dict(user) if user else None
+
+    async def get_by_id(self, user_id: int, loader: Loader) -> Optional[Dict[str, Any]]:
+        """Return a cached user by ID, loading it on a miss"""
+        return await self._get("id", self.id_key(user_id), loader)
+
+    async def get_many(self, user_ids: List[int], loader: ManyLoader) -> Dict[int, Dict[str, Any]]:
+        """Return cached users by ID, loading every miss with a single loader call"""
+        found: Dict[int, Dict[str, Any]] = {}
+        missing: List[int] = []
+        for user_id in user_ids:
+            cached = await self.backend.get(self.id_key(user_id))
+            if cached is not None:
+                found[user_id] = dict(cached)
+            else:
+                missing.append(user_id)
+        if found:
+            CACHE_HITS.inc(len(found), key="id")
+        if not missing:
+            return found
+
+        CACHE_MISSES.inc(len(missing), key="id")
+        generation = self._generation
+        loaded = await loader(missing)
+        for user_id, user in loaded.items():
+            if generation == self._generation:
+                await self.store(user)
+            found[user_id] = dict(user)
+        return found
+
+    async def store(self, user: Dict[str, Any]) -> None:
+        """Put a user row under both of its keys"""
+        await self.backend.set(self.id_key(user["id"]), user)
+        await self.backend.set(self.username_key(user["username"]), user)
+
+    async def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+        """Drop a user from the cache after it was written"""
+        self._generation += 1
+        keys = []
+        if user_id is not None:
+            keys.append(self.id_key(user_id))
+        if username is not None:
+            keys.append(self.username_key(username))
+        if keys:
+            await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        """Drop every cached user, e.g. after invalidations may have been missed"""
+        self._generation += 1
+        await self.backend.clear()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set
+
+import asyncpg
+
+from metrics import REGISTRY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Channel the users table triggers notify on (see migration 3)
+CHANNEL = "user_changes"
+
+CHANGES_RECEIVED = REGISTRY.counter("user_changes_received_total", "User change notifications received")
+CHANGE_SUBSCRIBERS = REGISTRY.gauge("user_change_subscribers", "Open user change feed subscriptions")
+CHANGE_OVERFLOWS = REGISTRY.counter(
+    "user_change_overflows_total",
+    "Subscriptions ended because the client fell too far behind"
+)
+
+
+def change_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a users row like the trigger's notification payload"""
+    if not row["is_active"]:
+        op = "delete"
+    elif row["created_at"] == row["updated_at"]:
+        op = "insert"
+    else:
+        op = "update"
+    return {
+        "op": op,
+        **{key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+    }
+
+
+def format_event(change: Dict[str, Any], horizon: int) -> bytes:
+    """Server-sent event whose id is the transaction id horizon to resume from (see migration 7)"""
+    data = {key: value for key, value in change.items() if key not in ("horizon", "change_xid")}
+    return (
+        f"id: {horizon}\n"
+        f"event: {change['op']}\n"
+        f"data: {json.dumps(data)}\n\n"
+    ).encode()
+
+
+class Subscription:
+    """Bounded queue of changes for one consumer; it is ended, not grown, when the consumer falls behind"""
+
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=queue_size)
+        self.lost = False
+
+    def push(self, change: Dict[str, Any]) -> None:
+        if self.lost:
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # The consumer drains what it has, then ends; it resumes from its last event id
+            self.lost = True
+            CHANGE_OVERFLOWS.inc()
+
+    def close(self) -> None:
+        """End the subscription, waking a consumer that is waiting for the next change"""
+        self.lost = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Next change, or None once the subscription has ended and is drained"""
+        if self.lost and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class ChangeFeed:
+    """LISTENs for user changes on one dedicated connection and fans them out to subscriptions"""
+
+    def __init__(
+        self,
+        dsn: str,
+        queue_size: int = 1000,
+        reconnect_delay: float = 1.0,
+        on_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_listen: Optional[Callable[[], None]] = None
+    ):
+        self.dsn = dsn
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        # Called for every change, and whenever listening (re)starts after changes may have been missed
+        self.on_change = on_change
+        self.on_listen = on_listen
+        self._conn: Optional[asyncpg.Connection] = None
+        self._subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def start(self) -> None:
+        """Start listening in the background, reconnecting whenever the connection drops"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                terminated = asyncio.Event()
+                conn.add_termination_listener(lambda _: terminated.set())
+                await conn.add_listener(CHANNEL, self._on_notify)
+                self._conn = conn
+                if self.on_listen:
+                    self.on_listen()
+                logger.info("Listening for user changes")
+                await terminated.wait()
+                logger.warning("User change listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to listen for user changes: {str(e)}")
+            finally:
+                self._conn = None
+                # Changes may be missed until we listen again; subscribers resume from their cursor
+                self._end_subscriptions()
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        CHANGES_RECEIVED.inc()
+        # Parsed once and shared by every subscription
+        change = json.loads(payload)
+        if self.on_change:
+            self.on_change(change)
+        for subscription in tuple(self._subscriptions):
+            subscription.push(change)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        CHANGE_SUBSCRIBERS.set(len(self._subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        CHANGE_SUBSCRIBERS.set(len(self._subscriptions))
+
+    def _end_subscriptions(self) -> None:
+        for subscription in self._subscriptions:
+            subscription.close()
+        self._subscriptions.clear()
+        CHANGE_SUBSCRIBERS.set(0)
+
+    async def close(self) -> None:
+        """Stop listening and end every subscription"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._end_subscriptions()
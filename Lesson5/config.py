@@ -14,6 +14,68 @@ DB_NAME = os.getenv("DB_NAME", "fastapi")
 # Construct database URL
 DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Database pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "30"))
+DB_POOL_MAX_IDLE_LIFETIME = float(os.getenv("DB_POOL_MAX_IDLE_LIFETIME", "300"))
+DB_POOL_ADAPTIVE = os.getenv("DB_POOL_ADAPTIVE", "False").lower() == "true"
+DB_POOL_TARGET_WAIT = float(os.getenv("DB_POOL_TARGET_WAIT_MS", "5")) / 1000
+
+# Read replicas: comma-separated postgresql:// URLs, empty to read from the primary only
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")  # or "least_busy"
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+
+# Password hashing configuration
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+# Bulk imports hash in small chunks on at most this many workers, leaving the rest for logins
+HASH_BULK_CONCURRENCY = int(os.getenv("HASH_BULK_CONCURRENCY", str(max(1, HASH_WORKERS // 2))))
+HASH_BULK_CHUNK_SIZE = int(os.getenv("HASH_BULK_CHUNK_SIZE", "8"))
+
+# Password hashing schemes: new hashes use the first, the rest are upgraded on the next login
+PASSWORD_SCHEMES = [scheme.strip() for scheme in os.getenv("PASSWORD_SCHEMES", "argon2,bcrypt").split(",") if scheme.strip()]
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Login rate limits: token buckets refilled at RATE attempts per second, holding at most BURST
+LOGIN_USER_RATE = float(os.getenv("LOGIN_USER_RATE", "0.2"))
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", "5"))
+LOGIN_IP_RATE = float(os.getenv("LOGIN_IP_RATE", "1"))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "20"))
+
+# Bulk import configuration
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "5000"))
+
+# User cache configuration: per worker, invalidated across workers through the user change feed
+# and bypassed while that feed is not listening
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "True").lower() == "true"
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Search micro-cache: identical searches within the TTL share one query
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "True").lower() == "true"
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "5"))
+
+# Write-behind configuration for last-login timestamps
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv("LAST_LOGIN_FLUSH_INTERVAL_MS", "500")) / 1000
+LAST_LOGIN_FLUSH_MAX = int(os.getenv("LAST_LOGIN_FLUSH_MAX", "1000"))
+
+# User change feed (server-sent events): per-subscriber queue bound and keepalive interval
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+CHANGE_FEED_KEEPALIVE = float(os.getenv("CHANGE_FEED_KEEPALIVE", "15"))
+
+# Serialize user lists straight from database records (uses orjson when installed)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "False").lower() == "true"
+
+# Add Server-Timing headers (db, serialize, handler) to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "False").lower() == "true"
+
 # Additional configurations
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 API_PREFIX = "/api"
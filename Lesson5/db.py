@@ -1,97 +1,225 @@
 import asyncpg
-from typing import Optional, List, Dict, Any
-from passlib.context import CryptContext
+from typing import Optional, List, Dict, Any, Set, Tuple, AsyncIterator, Awaitable, Callable, TypeVar
 import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from asyncpg.pool import Pool
 import asyncio
+import random
+
+from hashing import PasswordHasher, HashingBusyError
+from cache import CacheBackend, UserCache, CACHE_HITS, CACHE_MISSES
+from statements import PreparedConnection, update_statement_name
+from writebehind import LastLoginBuffer
+from pool import AdaptiveLimiter, QUERY_LATENCY, observe_acquire, track_pool
+from replicas import ReplicaRouter, REPLICA_ERRORS, READS
+from middleware import add_timing
+from migrations import migrate
+from loader import BatchLoader
+from changes import ChangeFeed, change_from_row
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Configure password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
 
 class DatabaseError(Exception):
     """Base exception for database errors"""
     pass
 
 class Database:
-    def __init__(self, db_url: str):
+    def __init__(
+        self,
+        db_url: str,
+        hasher: PasswordHasher,
+        cache: Optional[UserCache] = None,
+        search_cache: Optional[CacheBackend] = None,
+        last_login_flush_interval: float = 0.5,
+        last_login_flush_max: int = 1000,
+        min_size: int = 5,
+        max_size: int = 20,
+        command_timeout: float = 60,
+        connect_timeout: float = 30,
+        max_inactive_connection_lifetime: float = 300,
+        adaptive: bool = False,
+        adaptive_target_wait: float = 0.005,
+        replica_urls: Optional[List[str]] = None,
+        replica_strategy: str = "round_robin",
+        read_your_writes_window: float = 5.0,
+        change_queue_size: int = 1000
+    ):
         self.db_url = db_url
+        self.replicas = ReplicaRouter(
+            replica_urls or [],
+            strategy=replica_strategy,
+            sticky_window=read_your_writes_window
+        )
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.connect_timeout = connect_timeout
+        self.max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self.limiter = AdaptiveLimiter(min_size, max_size, adaptive_target_wait) if adaptive else None
+        self.hasher = hasher
+        self.cache = cache
+        self.search_cache = search_cache
+        self._id_loader: BatchLoader[int, Dict[str, Any]] = BatchLoader("get_by_id", self._fetch_many)
+        self.last_logins = LastLoginBuffer(
+            self._write_last_logins,
+            interval=last_login_flush_interval,
+            max_entries=last_login_flush_max
+        )
+        # Every worker listens, so a write on one worker also drops the row from the others' caches
+        self.changes = ChangeFeed(
+            db_url,
+            queue_size=change_queue_size,
+            on_change=self._forget_changed_user,
+            on_listen=self._forget_cached_users
+        )
         self.pool: Optional[Pool] = None
-        self._init_retries = 3
-        self._init_retry_interval = 5  # seconds
+        self._rehash_tasks: Set[asyncio.Task] = set()
+        self._cache_tasks: Set[asyncio.Task] = set()
+        track_pool(lambda: self.pool)
+        self.ready = False
+        self._init_retries = 8
+        self._init_retry_base_delay = 0.25  # seconds
+        self._init_retry_max_delay = 10  # seconds
 
-    async def connect(self) -> None:
-        """Create database connection pool with retry logic"""
-        retry_count = 0
-        while retry_count < self._init_retries:
+    async def _create_pool(self, url: str) -> Pool:
+        return await asyncpg.create_pool(
+            url,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            command_timeout=self.command_timeout,
+            timeout=self.connect_timeout,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+            connection_class=PreparedConnection
+        )
+
+    async def _connect_primary(self) -> None:
+        if self.pool:
+            return
+        for attempt in range(1, self._init_retries + 1):
             try:
-                self.pool = await asyncpg.create_pool(
-                    self.db_url,
-                    min_size=5,
-                    max_size=20,
-                    command_timeout=60,
-                    timeout=30
-                )
+                self.pool = await self._create_pool(self.db_url)
                 logger.info("Database connection pool created successfully!")
-                break
+                return
             except Exception as e:
-                retry_count += 1
-                if retry_count == self._init_retries:
+                if attempt == self._init_retries:
                     logger.error(f"Failed to create database pool after {self._init_retries} attempts: {str(e)}")
                     raise DatabaseError(f"Database connection failed: {str(e)}")
-                logger.warning(f"Failed to create pool, attempt {retry_count} of {self._init_retries}")
-                await asyncio.sleep(self._init_retry_interval)
+                # Exponential backoff with full jitter, so restarting workers do not retry in lockstep
+                delay = random.uniform(0, min(self._init_retry_max_delay, self._init_retry_base_delay * 2 ** attempt))
+                logger.warning(f"Failed to create pool, attempt {attempt} of {self._init_retries}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def connect(self) -> None:
+        """Create primary and replica connection pools and start the hash workers in parallel"""
+        results = await asyncio.gather(
+            self._connect_primary(),
+            self.replicas.connect(self._create_pool),
+            self.hasher.prepare(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        self.last_logins.start()
+
+    async def initialize(self) -> None:
+        """Connect and migrate; the database reports ready once both are done. Safe to call again after a failure"""
+        await self.connect()
+        await self.create_table()
+        await self.changes.start()
+        self.ready = True
+
+    @asynccontextmanager
+    async def acquire(self, method: str, pool: Optional[Pool] = None):
+        """Check out a connection (from the primary unless a pool is given), recording acquire wait and hold time"""
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        # The adaptive limiter only guards the primary pool
+        limiter = self.limiter if pool is None else None
+        started = time.perf_counter()
+        if limiter:
+            await limiter.acquire()
+        try:
+            async with (pool or self.pool).acquire() as conn:
+                acquired = time.perf_counter()
+                observe_acquire(acquired - started, limiter)
+                try:
+                    yield conn
+                finally:
+                    held = time.perf_counter() - acquired
+                    QUERY_LATENCY.observe(held, method=method)
+                    add_timing("db", time.perf_counter() - started)
+        finally:
+            if limiter:
+                await limiter.release()
+
+    async def _read(self, method: str, keys: Tuple[str, ...], query: Callable[[Any], Awaitable[T]]) -> T:
+        """Run a read-only query on a replica, falling back to the primary if the replica fails"""
+        replica = self.replicas.choose(*keys)
+        if replica is not None:
+            try:
+                async with self.acquire(method, replica) as conn:
+                    result = await query(conn)
+                READS.inc(target="replica")
+                return result
+            except REPLICA_ERRORS as e:
+                logger.warning(f"Replica read failed for {method}, retrying on primary: {str(e)}")
+                self.replicas.mark_failed(replica)
+
+        async with self.acquire(method) as conn:
+            result = await query(conn)
+        READS.inc(target="primary")
+        return result
+
+    @property
+    def _cache_usable(self) -> bool:
+        # Without the change listener, writes on other workers would not invalidate this worker's cache
+        return self.cache is not None and self.changes.listening
+
+    def _run_cache_task(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._cache_tasks.add(task)
+        task.add_done_callback(self._cache_tasks.discard)
+
+    def _forget_changed_user(self, change: Dict[str, Any]) -> None:
+        if self.cache:
+            self._run_cache_task(self.cache.invalidate(user_id=change["id"], username=change["username"]))
+
+    def _forget_cached_users(self) -> None:
+        # Changes made while the listener was down were never seen, so nothing cached can be trusted
+        if self.cache:
+            self._run_cache_task(self.cache.clear())
+
+    def _written(self, user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+        """Keep the user's (and current client's) reads on the primary for the read-your-writes window"""
+        keys = []
+        if user_id is not None:
+            keys.append(f"user:{user_id}")
+        if username is not None:
+            keys.append(f"username:{username.lower()}")
+        self.replicas.mark_written(*keys)
 
     async def create_table(self) -> None:
-        """Create necessary database tables"""
+        """Bring the database schema up to date by running pending migrations"""
         if not self.pool:
             raise DatabaseError("Database connection not initialized")
-            
+
         try:
-            async with self.pool.acquire() as conn:
-                # Create users table
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        id SERIAL PRIMARY KEY,
-                        full_name TEXT NOT NULL,
-                        username VARCHAR(20) UNIQUE NOT NULL,
-                        email VARCHAR(100) UNIQUE NOT NULL,
-                        password VARCHAR(255) NOT NULL,
-                        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                        last_login TIMESTAMP WITH TIME ZONE,
-                        is_active BOOLEAN DEFAULT TRUE,
-                        CONSTRAINT username_check CHECK (username ~ '^[a-zA-Z0-9_-]+$'),
-                        CONSTRAINT email_check CHECK (email ~ '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-                    )
-                ''')
-
-                # Create updated_at trigger
-                await conn.execute('''
-                    CREATE OR REPLACE FUNCTION update_updated_at_column()
-                    RETURNS TRIGGER AS $$
-                    BEGIN
-                        NEW.updated_at = CURRENT_TIMESTAMP;
-                        RETURN NEW;
-                    END;
-                    $$ language 'plpgsql';
-                ''')
-
-                await conn.execute('''
-                    DROP TRIGGER IF EXISTS update_users_updated_at ON users;
-                    CREATE TRIGGER update_users_updated_at
-                        BEFORE UPDATE ON users
-                        FOR EACH ROW
-                        EXECUTE FUNCTION update_updated_at_column();
-                ''')
-
-                logger.info("Database tables and triggers created successfully!")
+            async with self.acquire("migrate") as conn:
+                applied = await migrate(conn)
+            if applied:
+                # Connections opened before the migration re-prepare their statements against the new schema
+                await self.pool.expire_connections()
+                logger.info(f"Database schema migrated to version {applied[-1]}")
         except Exception as e:
-            logger.error(f"Failed to create database tables: {str(e)}")
-            raise DatabaseError(f"Table creation failed: {str(e)}")
+            logger.error(f"Failed to migrate database: {str(e)}")
+            raise DatabaseError(f"Database migration failed: {str(e)}")
 
     async def add(self, full_name: str, username: str, email: str, password: str) -> Dict[str, Any]:
         """Add a new user to the database"""
@@ -99,65 +227,239 @@ class Database:
             raise DatabaseError("Database connection not initialized")
 
         try:
-            hashed_password = pwd_context.hash(password)
-            
-            async with self.pool.acquire() as conn:
+            hashed_password = await self.hasher.hash(password)
+
+            async with self.acquire("add") as conn:
                 async with conn.transaction():
-                    user = await conn.fetchrow(
-                        """
-                        INSERT INTO users (full_name, username, email, password) 
-                        VALUES ($1, $2, $3, $4)
-                        RETURNING id, full_name, username, email, created_at, updated_at, is_active
-                        """,
-                        full_name, username.lower(), email.lower(), hashed_password
+                    user = await conn.fetchrow_named(
+                        "add", full_name, username.lower(), email.lower(), hashed_password
                     )
-                    return dict(user)
-        except asyncpg.UniqueViolationError as e:
-            logger.error(f"Unique constraint violation: {str(e)}")
+            self._written(user_id=user["id"], username=user["username"])
+            if self.cache:
+                await self.cache.invalidate(user_id=user["id"], username=user["username"])
+            return dict(user)
+        except (asyncpg.UniqueViolationError, HashingBusyError) as e:
+            logger.error(f"Failed to add user: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Failed to add user: {str(e)}")
             raise DatabaseError(f"Failed to create user: {str(e)}")
 
+    async def add_many(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Bulk insert users via COPY into a staging table, returning the rows skipped on conflict
+
+        Each user has either a password, hashed here, or a password_hash checked by the caller.
+        """
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        try:
+            # Rows that bring an existing hash skip hashing, by far the slowest part of an import
+            plain = [user for user in users if not user.get("password_hash")]
+            hashed_passwords = iter(await self.hasher.hash_many([user["password"] for user in plain]))
+            records = [
+                (
+                    user["row"], user["full_name"], user["username"].lower(), user["email"].lower(),
+                    user.get("password_hash") or next(hashed_passwords)
+                )
+                for user in users
+            ]
+
+            async with self.acquire("add_many") as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        """
+                        CREATE TEMP TABLE users_import (
+                            row_number INTEGER,
+                            full_name TEXT,
+                            username TEXT,
+                            email TEXT,
+                            password TEXT
+                        ) ON COMMIT DROP
+                        """
+                    )
+                    await conn.copy_records_to_table(
+                        "users_import",
+                        records=records,
+                        columns=["row_number", "full_name", "username", "email", "password"]
+                    )
+                    skipped = await conn.fetch(
+                        """
+                        WITH inserted AS (
+                            INSERT INTO users (full_name, username, email, password)
+                            SELECT full_name, username, email, password
+                            FROM users_import
+                            ORDER BY row_number
+                            ON CONFLICT DO NOTHING
+                            RETURNING username
+                        )
+                        SELECT i.row_number AS row, i.username
+                        FROM users_import i
+                        WHERE NOT EXISTS (SELECT 1 FROM inserted WHERE inserted.username = i.username)
+                        ORDER BY i.row_number
+                        """
+                    )
+            self._written()
+            return [dict(row) for row in skipped]
+        except HashingBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to bulk add users: {str(e)}")
+            raise DatabaseError(f"Failed to import users: {str(e)}")
+
     async def all(self) -> List[Dict[str, Any]]:
         """Retrieve all active users"""
         if not self.pool:
             raise DatabaseError("Database connection not initialized")
 
         try:
-            async with self.pool.acquire() as conn:
-                users = await conn.fetch(
-                    """
-                    SELECT id, full_name, username, email, created_at, updated_at, is_active
-                    FROM users 
-                    WHERE is_active = TRUE
-                    ORDER BY created_at DESC
-                    """
-                )
-                return [dict(user) for user in users]
+            users = await self._read("all", (), lambda conn: conn.fetch_named("all"))
+            return [dict(user) for user in users]
         except Exception as e:
             logger.error(f"Failed to fetch users: {str(e)}")
             raise DatabaseError(f"Failed to fetch users: {str(e)}")
 
+    async def page(self, limit: int, after: Optional[Tuple[datetime, int]] = None) -> List[asyncpg.Record]:
+        """Retrieve one page of active users, newest first, after a (created_at, id) cursor
+
+        Returns the asyncpg records, so callers that serialize them directly skip a dict copy.
+        """
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        try:
+            if after is None:
+                return await self._read("page", (), lambda conn: conn.fetch_named("page_first", limit))
+            return await self._read(
+                "page", (), lambda conn: conn.fetch_named("page_after", after[0], after[1], limit)
+            )
+        except Exception as e:
+            logger.error(f"Failed to fetch users page: {str(e)}")
+            raise DatabaseError(f"Failed to fetch users: {str(e)}")
+
+    async def stream(
+        self,
+        after: Optional[Tuple[datetime, int]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over active users, newest first, through a server-side cursor"""
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        query = """
+            SELECT id, full_name, username, email, created_at, updated_at, is_active
+            FROM users
+            WHERE is_active = TRUE {condition}
+            ORDER BY created_at DESC, id DESC
+        """
+        if after is None:
+            query, args = query.format(condition=""), ()
+        else:
+            query, args = query.format(condition="AND (created_at, id) < ($1, $2)"), after
+
+        replica = self.replicas.choose()
+        try:
+            if replica is not None:
+                try:
+                    # Probe the replica first; once rows are flowing there is no fallback
+                    async with self.acquire("stream", replica) as conn:
+                        await conn.execute("SELECT 1")
+                except REPLICA_ERRORS as e:
+                    logger.warning(f"Replica unavailable for stream, using primary: {str(e)}")
+                    self.replicas.mark_failed(replica)
+                    replica = None
+
+            READS.inc(target="replica" if replica is not None else "primary")
+            async with self.acquire("stream", replica) as conn:
+                # Server-side cursors only live inside a transaction
+                async with conn.transaction(readonly=True):
+                    async for user in conn.cursor(query, *args, prefetch=batch_size):
+                        yield dict(user)
+        except Exception as e:
+            logger.error(f"Failed to stream users: {str(e)}")
+            raise DatabaseError(f"Failed to stream users: {str(e)}")
+
+    async def changes_after(self, after: Tuple[int, int], limit: int = 1000) -> List[Dict[str, Any]]:
+        """Users last changed by a transaction after the (transaction id, user id) position, as change feed events
+
+        Each event keeps its row's change_xid, so the caller can page on from the last one.
+        """
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        try:
+            # Always the primary: a lagging replica would make a resuming consumer skip changes
+            async with self.acquire("changes_after") as conn:
+                rows = await conn.fetch_named("changes_after", str(after[0]), after[1], limit)
+            return [change_from_row(dict(row)) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to fetch user changes: {str(e)}")
+            raise DatabaseError(f"Failed to fetch user changes: {str(e)}")
+
     async def get_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Retrieve user by ID"""
+        """Retrieve user by ID, through the user cache when one is configured"""
+        # Misses go through the batcher, so concurrent lookups of different ids share one query
+        if self._cache_usable:
+            return await self.cache.get_by_id(user_id, lambda: self._id_loader.load(user_id))
+        return await self._id_loader.load(user_id)
+
+    async def get_many(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Retrieve users by ID with one query, keyed by ID; unknown or deleted IDs are left out"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        if self._cache_usable:
+            return await self.cache.get_many(user_ids, self._fetch_many)
+        return await self._fetch_many(user_ids)
+
+    async def search(self, query: str, limit: int = 20, prefix: bool = False) -> List[Dict[str, Any]]:
+        """Find active users by name, username or email: fuzzy and substring matches, or prefixes for autocomplete"""
         if not self.pool:
             raise DatabaseError("Database connection not initialized")
 
+        query = query.strip().lower()
+        key = f"search:{'prefix' if prefix else 'fuzzy'}:{limit}:{query}"
+        if self.search_cache:
+            # Short-lived: repeated keystrokes and admin refreshes, not a consistent view
+            cached = await self.search_cache.get(key)
+            if cached is not None:
+                CACHE_HITS.inc(key="search")
+                return cached
+            CACHE_MISSES.inc(key="search")
+
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
         try:
-            async with self.pool.acquire() as conn:
-                user = await conn.fetchrow(
-                    """
-                    SELECT id, full_name, username, email, created_at, updated_at, is_active
-                    FROM users 
-                    WHERE id = $1 AND is_active = TRUE
-                    """,
-                    user_id
+            if prefix:
+                rows = await self._read(
+                    "search", (), lambda conn: conn.fetch_named("search_prefix", f"{pattern}%", limit)
+                )
+            else:
+                rows = await self._read(
+                    "search", (), lambda conn: conn.fetch_named("search", query, f"%{pattern}%", limit)
                 )
-                return dict(user) if user else None
         except Exception as e:
-            logger.error(f"Failed to fetch user: {str(e)}")
-            raise DatabaseError(f"Failed to fetch user: {str(e)}")
+            logger.error(f"Failed to search users: {str(e)}")
+            raise DatabaseError(f"Failed to search users: {str(e)}")
+
+        users = [dict(row) for row in rows]
+        if self.search_cache:
+            await self.search_cache.set(key, users)
+        return users
+
+    async def _fetch_many(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        try:
+            rows = await self._read(
+                "get_many",
+                tuple(f"user:{user_id}" for user_id in user_ids),
+                lambda conn: conn.fetch_named("get_many", user_ids)
+            )
+            return {row["id"]: dict(row) for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to fetch users: {str(e)}")
+            raise DatabaseError(f"Failed to fetch users: {str(e)}")
 
     async def update(self, user_id: int, full_name: str = None, email: str = None, password: str = None) -> Optional[Dict[str, Any]]:
         """Update user information by ID"""
@@ -165,35 +467,33 @@ class Database:
             raise DatabaseError("Database connection not initialized")
 
         try:
-            async with self.pool.acquire() as conn:
+            fields = {}
+            if full_name:
+                fields["full_name"] = full_name
+            if email:
+                fields["email"] = email.lower()
+            if password:
+                fields["password"] = await self.hasher.hash(password)
+
+            if not fields:
+                return None
+
+            # One fixed prepared statement per combination of updated fields
+            statement = update_statement_name(fields)
+            async with self.acquire("update") as conn:
                 async with conn.transaction():
-                    updates = []
-                    values = []
-                    if full_name:
-                        updates.append(f"full_name = ${len(values) + 1}")
-                        values.append(full_name)
-                    if email:
-                        updates.append(f"email = ${len(values) + 1}")
-                        values.append(email.lower())
-                    if password:
-                        updates.append(f"password = ${len(values) + 1}")
-                        values.append(pwd_context.hash(password))
-                    
-                    if not updates:
-                        return None
-
-                    values.append(user_id)
-                    query = f"""
-                        UPDATE users 
-                        SET {', '.join(updates)}
-                        WHERE id = ${len(values)} AND is_active = TRUE
-                        RETURNING id, full_name, username, email, created_at, updated_at, is_active
-                    """
-                    user = await conn.fetchrow(query, *values)
-                    return dict(user) if user else None
+                    user = await conn.fetchrow_named(statement, *fields.values(), user_id)
+            if user is None:
+                return None
+            self._written(user_id=user["id"], username=user["username"])
+            if self.cache:
+                await self.cache.invalidate(user_id=user["id"], username=user["username"])
+            return dict(user)
         except asyncpg.UniqueViolationError:
             logger.error("Email already exists")
             raise
+        except HashingBusyError:
+            raise
         except Exception as e:
             logger.error(f"Failed to update user: {str(e)}")
             raise DatabaseError(f"Failed to update user: {str(e)}")
@@ -204,17 +504,15 @@ class Database:
             raise DatabaseError("Database connection not initialized")
 
         try:
-            async with self.pool.acquire() as conn:
+            async with self.acquire("delete") as conn:
                 async with conn.transaction():
-                    result = await conn.execute(
-                        """
-                        UPDATE users 
-                        SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = $1 AND is_active = TRUE
-                        """,
-                        user_id
-                    )
-                    return 'UPDATE 1' in result
+                    username = await conn.fetchval_named("delete", user_id)
+            if username is None:
+                return False
+            self._written(user_id=user_id, username=username)
+            if self.cache:
+                await self.cache.invalidate(user_id=user_id, username=username)
+            return True
         except Exception as e:
             logger.error(f"Failed to delete user: {str(e)}")
             raise DatabaseError(f"Failed to delete user: {str(e)}")
@@ -225,43 +523,75 @@ class Database:
             raise DatabaseError("Database connection not initialized")
 
         try:
-            async with self.pool.acquire() as conn:
-                stored_password = await conn.fetchval(
-                    """
-                    SELECT password 
-                    FROM users 
-                    WHERE username = $1 AND is_active = TRUE
-                    """,
-                    username.lower()
-                )
-                if stored_password is None:
-                    return False
-                return pwd_context.verify(password, stored_password)
+            stored_password = await self._read(
+                "verify_password",
+                (f"username:{username.lower()}",),
+                lambda conn: conn.fetchval_named("verify_password", username.lower())
+            )
+            if stored_password is None:
+                # Keep response time the same whether or not the username exists
+                return await self.hasher.verify_dummy(password)
+            ok, needs_update = await self.hasher.verify(password, stored_password)
+        except HashingBusyError:
+            raise
         except Exception as e:
             logger.error(f"Failed to verify password: {str(e)}")
             raise DatabaseError(f"Failed to verify password: {str(e)}")
 
+        if needs_update:
+            # Upgrade to the current scheme without delaying this login
+            task = asyncio.create_task(self._rehash_password(username.lower(), password, stored_password))
+            self._rehash_tasks.add(task)
+            task.add_done_callback(self._rehash_tasks.discard)
+        return ok
+
+    async def _rehash_password(self, username: str, password: str, old_hash: str) -> None:
+        try:
+            new_hash = await self.hasher.hash(password)
+            async with self.acquire("upgrade_password") as conn:
+                # Matching the old hash skips users who changed their password meanwhile
+                user_id = await conn.fetchval_named("upgrade_password", username, old_hash, new_hash)
+            if user_id is None:
+                return
+            self._written(user_id=user_id, username=username)
+            if self.cache:
+                await self.cache.invalidate(user_id=user_id, username=username)
+            logger.info(f"Upgraded password hash for {username}")
+        except Exception as e:
+            # The next successful login tries again
+            logger.warning(f"Failed to upgrade password hash for {username}: {str(e)}")
+
     async def update_last_login(self, username: str) -> None:
-        """Update user's last login timestamp"""
+        """Record user's last login timestamp; written in batches by the write-behind buffer"""
         if not self.pool:
             raise DatabaseError("Database connection not initialized")
 
-        try:
-            async with self.pool.acquire() as conn:
-                await conn.execute(
-                    """
-                    UPDATE users 
-                    SET last_login = CURRENT_TIMESTAMP 
-                    WHERE username = $1 AND is_active = TRUE
-                    """,
-                    username.lower()
-                )
-        except Exception as e:
-            logger.error(f"Failed to update last login: {str(e)}")
-            raise DatabaseError(f"Failed to update last login: {str(e)}")
+        self.last_logins.record(username.lower())
+
+    async def _write_last_logins(self, usernames: List[str], timestamps: List[datetime]) -> None:
+        if not self.pool:
+            raise DatabaseError("Database connection not initialized")
+
+        # Same order the statement locks the rows in
+        pairs = sorted(zip(usernames, timestamps))
+        async with self.acquire("update_last_login") as conn:
+            await conn.fetch_named("update_last_logins", [pair[0] for pair in pairs], [pair[1] for pair in pairs])
+
+    async def flush_pending_writes(self) -> None:
+        """Finish password upgrades, write buffered last-login timestamps and stop the background flusher"""
+        if self._rehash_tasks:
+            await asyncio.gather(*self._rehash_tasks, return_exceptions=True)
+        await self.last_logins.stop()
 
     async def close(self) -> None:
-        """Close database connection pool"""
+        """Close database connection pools and the password hashing workers"""
+        self.ready = False
+        await self.changes.close()
+        if self._cache_tasks:
+            await asyncio.gather(*self._cache_tasks, return_exceptions=True)
+        await self.flush_pending_writes()
+        self.hasher.close()
+        await self.replicas.close()
         if self.pool:
             try:
                 await self.pool.close()
@@ -1,15 +1,71 @@
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException, Request
 from db import Database
-from config import DB_URL
+from replicas import client_key
+from hashing import PasswordHasher
+from cache import LRUCache, UserCache
+from login import LoginService, MemoryRateLimitBackend
+from config import (
+    DB_URL, HASH_WORKERS, HASH_QUEUE_SIZE, HASH_BULK_CONCURRENCY, HASH_BULK_CHUNK_SIZE,
+    USER_CACHE_ENABLED, USER_CACHE_SIZE, USER_CACHE_TTL,
+    SEARCH_CACHE_ENABLED, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL,
+    LAST_LOGIN_FLUSH_INTERVAL, LAST_LOGIN_FLUSH_MAX,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_COMMAND_TIMEOUT, DB_CONNECT_TIMEOUT,
+    DB_POOL_MAX_IDLE_LIFETIME, DB_POOL_ADAPTIVE, DB_POOL_TARGET_WAIT,
+    DB_REPLICA_URLS, DB_REPLICA_STRATEGY, DB_READ_YOUR_WRITES_WINDOW,
+    LOGIN_USER_RATE, LOGIN_USER_BURST, LOGIN_IP_RATE, LOGIN_IP_BURST,
+    CHANGE_FEED_QUEUE_SIZE
+)
+
+# Create user cache
+user_cache = UserCache(LRUCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)) if USER_CACHE_ENABLED else None
+
+# Create search micro-cache
+search_cache = LRUCache(max_size=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL) if SEARCH_CACHE_ENABLED else None
 
 # Create database instance
-db = Database(DB_URL)
+db = Database(
+    DB_URL,
+    hasher=PasswordHasher(HASH_WORKERS, HASH_QUEUE_SIZE, HASH_BULK_CONCURRENCY, HASH_BULK_CHUNK_SIZE),
+    cache=user_cache,
+    search_cache=search_cache,
+    last_login_flush_interval=LAST_LOGIN_FLUSH_INTERVAL,
+    last_login_flush_max=LAST_LOGIN_FLUSH_MAX,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    command_timeout=DB_COMMAND_TIMEOUT,
+    connect_timeout=DB_CONNECT_TIMEOUT,
+    max_inactive_connection_lifetime=DB_POOL_MAX_IDLE_LIFETIME,
+    adaptive=DB_POOL_ADAPTIVE,
+    adaptive_target_wait=DB_POOL_TARGET_WAIT,
+    replica_urls=DB_REPLICA_URLS,
+    replica_strategy=DB_REPLICA_STRATEGY,
+    read_your_writes_window=DB_READ_YOUR_WRITES_WINDOW,
+    change_queue_size=CHANGE_FEED_QUEUE_SIZE
+)
 
-async def get_db() -> Database:
+# Create login service
+login_service = LoginService(
+    db,
+    limiter=MemoryRateLimitBackend(),
+    user_rate=LOGIN_USER_RATE,
+    user_burst=LOGIN_USER_BURST,
+    ip_rate=LOGIN_IP_RATE,
+    ip_burst=LOGIN_IP_BURST
+)
+
+async def get_db(request: Request) -> Database:
     """Dependency to get database instance"""
-    if not db.pool:
+    # Lets the database keep this client's reads on the primary right after its own writes. Only an
+    # explicit id: behind a proxy every request shares one peer address, so one write would pin all reads
+    client_key.set(request.headers.get("X-Client-Id"))
+    if not db.ready:
         raise HTTPException(
-            status_code=500,
-            detail="Database connection not initialized"
+            status_code=503,
+            detail="Database is starting, please retry shortly",
+            headers={"Retry-After": "1"}
         )
-    return db 
\ No newline at end of file
+    return db
+
+async def get_login_service(db: Database = Depends(get_db)) -> LoginService:
+    """Dependency to get the login service once the database is ready"""
+    return login_service
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from metrics import REGISTRY
+from config import PASSWORD_SCHEMES, ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM, BCRYPT_ROUNDS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def build_context(schemes: List[str]) -> CryptContext:
+    """Hash with the first scheme; hashes from the others still verify and are marked for upgrade"""
+    settings: Dict[str, Any] = {}
+    if "argon2" in schemes:
+        settings.update(
+            argon2__type="ID",
+            argon2__time_cost=ARGON2_TIME_COST,
+            argon2__memory_cost=ARGON2_MEMORY_COST,
+            argon2__parallelism=ARGON2_PARALLELISM
+        )
+    if "bcrypt" in schemes:
+        settings["bcrypt__rounds"] = BCRYPT_ROUNDS
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+
+# Configure password hashing
+pwd_context = build_context(PASSWORD_SCHEMES)
+
+HASH_QUEUE_DEPTH = REGISTRY.gauge(
+    "password_hash_queue_depth",
+    "Password hash jobs submitted to the executor and not finished yet"
+)
+HASH_LATENCY = REGISTRY.histogram(
+    "password_hash_seconds",
+    "Time from submitting a password hash job to its result, including queue wait",
+    labelnames=("operation",)
+)
+HASH_REJECTED = REGISTRY.counter(
+    "password_hash_rejected_total",
+    "Password hash jobs rejected because the executor queue was full",
+    labelnames=("operation",)
+)
+
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing executor is saturated"""
+    pass
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _verify(password: str, hashed_password: str) -> Tuple[bool, bool]:
+    ok = pwd_context.verify(password, hashed_password)
+    return ok, ok and pwd_context.needs_update(hashed_password)
+
+
+class PasswordHasher:
+    """Runs password hashing in a process pool so it never blocks the event loop"""
+
+    def __init__(self, workers: int, queue_size: int, bulk_concurrency: int = 1, bulk_chunk_size: int = 8):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.bulk_concurrency = max(1, bulk_concurrency)
+        self.bulk_chunk_size = max(1, bulk_chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._bulk_slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._dummy_hash: Optional[str] = None
+
+    @property
+    def pending(self) -> int:
+        """Jobs currently running or waiting for a worker"""
+        return self._pending
+
+    def start(self) -> None:
+        """Start the worker processes"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(f"Password hashing pool started with {self.workers} workers")
+
+    async def _submit(self, operation: str, func: Callable[..., Any], *args: Any, reject_when_full: bool = True) -> Any:
+        if reject_when_full and self._pending >= self.workers + self.queue_size:
+            HASH_REJECTED.inc(operation=operation)
+            raise HashingBusyError("Password hashing queue is full, try again later")
+
+        self.start()
+        self._pending += 1
+        HASH_QUEUE_DEPTH.set(self._pending)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            HASH_QUEUE_DEPTH.set(self._pending)
+            HASH_LATENCY.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password"""
+        return await self._submit("hash", _hash, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash a batch of passwords in small chunks, with at most bulk_concurrency chunks in flight"""
+        if not passwords:
+            return []
+        if self._bulk_slots is None:
+            # Shared by every import, so concurrent imports cannot take over the pool between them
+            self._bulk_slots = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def hash_chunk(chunk: List[str]) -> List[str]:
+            # Bulk chunks wait for a slot instead of failing when logins fill the queue; the slots
+            # already bound how much of the queue they can take
+            async with self._bulk_slots:
+                return await self._submit("hash_many", _hash_many, chunk, reject_when_full=False)
+
+        size = self.bulk_chunk_size
+        tasks = [
+            asyncio.ensure_future(hash_chunk(passwords[i:i + size]))
+            for i in range(0, len(passwords), size)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't keep hashing the rest of a batch that has already failed
+            for task in tasks:
+                task.cancel()
+            raise
+        return [hashed for chunk in results for hashed in chunk]
+
+    def is_known_hash(self, hashed_password: str) -> bool:
+        """Whether a hash uses one of the configured schemes, so it can be stored and verified as is"""
+        return pwd_context.identify(hashed_password, required=False) is not None
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, bool]:
+        """Verify a password against its hash; returns (ok, hash uses an outdated scheme or cost)"""
+        return await self._submit("verify", _verify, password, hashed_password)
+
+    async def prepare(self) -> None:
+        """Start the workers and precompute the hash used for unknown usernames"""
+        self.start()
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+
+    async def verify_dummy(self, password: str) -> bool:
+        """Verify against a throwaway hash so unknown usernames cost as much as real ones"""
+        await self.prepare()
+        await self.verify(password, self._dummy_hash)
+        return False
+
+    def close(self) -> None:
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Password hashing pool stopped")
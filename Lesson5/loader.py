@@ -0,0 +1,69 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Set, TypeVar
+
+from metrics import REGISTRY
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+BATCH_SIZE = REGISTRY.histogram(
+    "batch_loader_keys",
+    "Keys resolved per batched load",
+    labelnames=("loader",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+
+class BatchLoader(Generic[K, V]):
+    """DataLoader-style batcher: load(key) calls made in the same event loop tick share one load_many call"""
+
+    def __init__(self, name: str, load_many: Callable[[List[K]], Awaitable[Dict[K, V]]], max_batch_size: int = 1000):
+        self.name = name
+        self.load_many = load_many
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: K) -> Optional[V]:
+        """Return the value for key, or None if load_many did not return it"""
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif not self._scheduled:
+                # Runs after every callback already queued, i.e. once this tick's callers have added their keys
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        self._scheduled = False
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[K, "asyncio.Future[Optional[V]]"]) -> None:
+        BATCH_SIZE.observe(len(batch), loader=self.name)
+        try:
+            values = await self.load_many(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Waiters re-raise it; make sure the future never logs "exception never retrieved"
+                    future.exception()
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(values.get(key))
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from db import Database
+from metrics import REGISTRY
+
+LOGIN_ATTEMPTS = REGISTRY.counter("login_attempts_total", "Login attempts by outcome", labelnames=("outcome",))
+LOGIN_COALESCED = REGISTRY.counter(
+    "login_coalesced_total",
+    "Login attempts that shared an identical in-flight verification"
+)
+
+
+class RateLimitedError(Exception):
+    """Raised when a login attempt exceeds a rate limit"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Too many login attempts, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RateLimitBackend:
+    """Token bucket storage; shared backends (e.g. Redis) implement the same method"""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take one token; return 0 on success or the seconds until a token is available"""
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process token buckets, kept in least recently used order"""
+
+    # Buckets examined per take(), so pruning is spread across calls instead of scanning them all
+    PRUNE_STEP = 8
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated, full_at); past full_at the bucket has refilled and can be forgotten
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None)
+        tokens = float(burst) if bucket is None else min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+        if tokens < 1:
+            retry_after = (1 - tokens) / rate
+        else:
+            tokens -= 1
+            retry_after = 0.0
+        # Each bucket carries its own refill deadline, so limiters with different rates don't evict each other
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._prune(now)
+        return retry_after
+
+    def _prune(self, now: float) -> None:
+        # The front holds the buckets untouched the longest; stop at the first one still refilling
+        for _ in range(self.PRUNE_STEP):
+            if not self._buckets:
+                break
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Future"] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Return (result, shared) where shared is True if another caller did the work"""
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await func()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+
+class LoginService:
+    """Password login with per-username and per-IP rate limits and coalesced verification"""
+
+    def __init__(
+        self,
+        db: Database,
+        limiter: RateLimitBackend,
+        user_rate: float,
+        user_burst: int,
+        ip_rate: float,
+        ip_burst: int
+    ):
+        self.db = db
+        self.limiter = limiter
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self._flights = SingleFlight()
+
+    async def _check_limits(self, username: str, ip: Optional[str]) -> None:
+        retry_after = await self.limiter.take(f"login:user:{username}", self.user_rate, self.user_burst)
+        if not retry_after and ip:
+            retry_after = await self.limiter.take(f"login:ip:{ip}", self.ip_rate, self.ip_burst)
+        if retry_after:
+            LOGIN_ATTEMPTS.inc(outcome="rate_limited")
+            raise RateLimitedError(math.ceil(retry_after))
+
+    async def login(self, username: str, password: str, ip: Optional[str] = None) -> bool:
+        """Verify credentials and record the login; raises RateLimitedError when over a limit"""
+        username = username.lower()
+        await self._check_limits(username, ip)
+
+        # Identical concurrent attempts (same username and password) share one bcrypt verify
+        key = hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
+        ok, shared = await self._flights.do(key, lambda: self.db.verify_password(username, password))
+        if shared:
+            LOGIN_COALESCED.inc()
+
+        LOGIN_ATTEMPTS.inc(outcome="success" if ok else "failure")
+        if ok:
+            await self.db.update_last_login(username)
+        return ok
@@ -1,30 +1,51 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+import random
+from contextlib import asynccontextmanager, suppress
 
-from db import DatabaseError
 from router import user
-from config import DEBUG
+from config import DEBUG, SERVER_TIMING
 from dependencies import db
+from metrics import REGISTRY
+from middleware import PerformanceMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Backoff between initialization attempts while the database is unreachable or being migrated (seconds)
+INIT_RETRY_BASE_DELAY = 1
+INIT_RETRY_MAX_DELAY = 60
+
+async def initialize_database():
+    # Keep retrying: the worker stays unready until the database is connected and migrated
+    attempt = 0
+    while True:
+        try:
+            await db.initialize()
+            logger.info("Database initialized successfully")
+            return
+        except Exception as e:
+            attempt += 1
+            delay = random.uniform(0, min(INIT_RETRY_MAX_DELAY, INIT_RETRY_BASE_DELAY * 2 ** attempt))
+            logger.error(f"Failed to initialize database, retrying in {delay:.1f}s: {str(e)}")
+            await asyncio.sleep(delay)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create database connection pool
+    # Startup: connect and migrate in the background, so the worker answers health checks right away
+    app.state.startup = asyncio.create_task(initialize_database())
     try:
-        await db.connect()
-        await db.create_table()
-        logger.info("Database initialized successfully")
         yield
-    except DatabaseError as e:
-        logger.error(f"Failed to initialize database: {str(e)}")
-        raise
     finally:
-        # Shutdown: Close database connection
+        if not app.state.startup.done():
+            app.state.startup.cancel()
+        with suppress(asyncio.CancelledError):
+            await app.state.startup
+        # Shutdown: close database connection (buffered last-login timestamps are written first)
         await db.close()
         logger.info("Database connection closed")
 
@@ -47,6 +68,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and times the whole stack
+app.add_middleware(PerformanceMiddleware, server_timing=SERVER_TIMING)
+
 # Include routers
 app.include_router(user.router)
 
@@ -60,6 +84,26 @@ async def root():
         "redoc_url": "/api/redoc"
     }
 
+@app.get("/health/live", include_in_schema=False)
+async def health_live(request: Request):
+    """Liveness: the process is serving and its startup task has not died without connecting"""
+    startup = request.app.state.startup
+    if startup.done() and not db.ready:
+        return JSONResponse({"status": "failed"}, status_code=503)
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """Readiness: the database is connected and migrated"""
+    if not db.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose application metrics in Prometheus text format"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
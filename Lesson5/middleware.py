@@ -0,0 +1,100 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from metrics import REGISTRY
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Request latency from first byte in to last byte out",
+    labelnames=("method", "route", "status")
+)
+REQUEST_PHASES = REGISTRY.histogram(
+    "http_request_phase_seconds",
+    "Request time split into db, serialize, handler (everything else before the response starts) and send",
+    labelnames=("route", "phase")
+)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_bytes",
+    "Response body size",
+    labelnames=("route",),
+    buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests currently being processed")
+
+# Per-request accumulator of time spent in named phases (db, serialize)
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def add_timing(phase: str, seconds: float) -> None:
+    """Attribute time to a phase of the current request, if there is one"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class PerformanceMiddleware:
+    """Pure ASGI middleware recording per-route latency, phase timings, response size and in-flight requests"""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The dict is shared by reference, so threadpool dependencies can add to it too
+        timings: Dict[str, float] = {"db": 0.0, "serialize": 0.0}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        state = {"status": 500, "bytes": 0, "response_started": None}
+        IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                state["status"] = message["status"]
+                state["response_started"] = now
+                if self.server_timing:
+                    app_time = now - started
+                    handler = max(0.0, app_time - timings["db"] - timings["serialize"])
+                    value = (
+                        f"db;dur={timings['db'] * 1000:.2f}, "
+                        f"serialize;dur={timings['serialize'] * 1000:.2f}, "
+                        f"handler;dur={handler * 1000:.2f}, "
+                        f"app;dur={app_time * 1000:.2f}"
+                    )
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"server-timing", value.encode("latin-1"))]
+                    }
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            IN_FLIGHT.dec()
+            request_timings.reset(token)
+
+            route = _route_path(scope)
+            REQUEST_LATENCY.observe(finished - started, method=scope["method"], route=route, status=str(state["status"]))
+            RESPONSE_BYTES.observe(state["bytes"], route=route)
+
+            response_started = state["response_started"] or finished
+            handler = max(0.0, response_started - started - timings["db"] - timings["serialize"])
+            REQUEST_PHASES.observe(timings["db"], route=route, phase="db")
+            REQUEST_PHASES.observe(timings["serialize"], route=route, phase="serialize")
+            REQUEST_PHASES.observe(handler, route=route, phase="handler")
+            REQUEST_PHASES.observe(finished - response_started, route=route, phase="send")
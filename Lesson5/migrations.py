@@ -0,0 +1,323 @@
+import asyncio
+import logging
+from typing import List, NamedTuple
+
+import asyncpg
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_lock, shared by every worker running migrations
+MIGRATION_LOCK_ID = 5_202_501
+# Backoff between attempts to take the migration lock while another worker holds it (seconds)
+LOCK_RETRY_BASE_DELAY = 0.1
+LOCK_RETRY_MAX_DELAY = 2.0
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+
+# Append only: applied migrations are never edited, a change is a new version
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create users table", r'''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            full_name TEXT NOT NULL,
+            username VARCHAR(20) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP WITH TIME ZONE,
+            is_active BOOLEAN DEFAULT TRUE,
+            CONSTRAINT username_check CHECK (username ~ '^[a-zA-Z0-9_-]+$'),
+            CONSTRAINT email_check CHECK (email ~ '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+        );
+
+        CREATE OR REPLACE FUNCTION update_updated_at_column()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.updated_at = CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql';
+
+        DROP TRIGGER IF EXISTS update_users_updated_at ON users;
+        CREATE TRIGGER update_users_updated_at
+            BEFORE UPDATE ON users
+            FOR EACH ROW
+            EXECUTE FUNCTION update_updated_at_column();
+
+        -- Keyset pagination index for active users, newest first
+        CREATE INDEX IF NOT EXISTS users_active_created_at_id_idx
+        ON users (created_at DESC, id DESC)
+        WHERE is_active = TRUE;
+    '''),
+    Migration(2, "add trigram search indexes", '''
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        -- Serve both substring/similarity search and prefix autocomplete (LIKE 'abc%')
+        CREATE INDEX IF NOT EXISTS users_full_name_trgm_idx
+        ON users USING GIN (lower(full_name) gin_trgm_ops)
+        WHERE is_active = TRUE;
+
+        CREATE INDEX IF NOT EXISTS users_username_trgm_idx
+        ON users USING GIN (username gin_trgm_ops)
+        WHERE is_active = TRUE;
+
+        CREATE INDEX IF NOT EXISTS users_email_trgm_idx
+        ON users USING GIN (email gin_trgm_ops)
+        WHERE is_active = TRUE;
+    '''),
+    Migration(3, "notify user changes", '''
+        -- Only user-visible changes move updated_at (not last_login writes), so it can drive a change feed
+        DROP TRIGGER IF EXISTS update_users_updated_at ON users;
+        CREATE TRIGGER update_users_updated_at
+            BEFORE UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.full_name IS DISTINCT FROM NEW.full_name
+                  OR OLD.email IS DISTINCT FROM NEW.email
+                  OR OLD.password IS DISTINCT FROM NEW.password
+                  OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+            EXECUTE FUNCTION update_updated_at_column();
+
+        CREATE OR REPLACE FUNCTION notify_user_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('user_changes', (
+                jsonb_build_object('op', CASE
+                    WHEN TG_OP = 'INSERT' THEN 'insert'
+                    WHEN NOT NEW.is_active THEN 'delete'
+                    ELSE 'update'
+                END) || (to_jsonb(NEW) - 'password' - 'last_login')
+            )::text);
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        CREATE TRIGGER users_notify_insert
+            AFTER INSERT ON users
+            FOR EACH ROW
+            EXECUTE FUNCTION notify_user_change();
+
+        CREATE TRIGGER users_notify_update
+            AFTER UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.updated_at IS DISTINCT FROM NEW.updated_at)
+            EXECUTE FUNCTION notify_user_change();
+
+        -- Resuming the feed reads changes in (updated_at, id) order, deleted users included
+        CREATE INDEX IF NOT EXISTS users_updated_at_id_idx
+        ON users (updated_at, id);
+    '''),
+    Migration(4, "count users versions", '''
+        -- A single row bumped by every user-visible write. Writers queue on its row lock, so versions
+        -- follow commit order, unlike updated_at, which is the writing transaction's start time
+        CREATE TABLE IF NOT EXISTS users_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0,
+            modified_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO users_version DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION bump_users_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE users_version SET version = version + 1, modified_at = clock_timestamp();
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        -- Once per insert statement, so a bulk import bumps it once per batch
+        CREATE TRIGGER users_version_insert
+            AFTER INSERT ON users
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION bump_users_version();
+
+        CREATE TRIGGER users_version_update
+            AFTER UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.updated_at IS DISTINCT FROM NEW.updated_at)
+            EXECUTE FUNCTION bump_users_version();
+    '''),
+    Migration(5, "number user changes in commit order", '''
+        -- Each user-visible write stamps its row with the next users_version, so the change feed can
+        -- resume from a position that follows commit order (updated_at is the transaction start time)
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+
+        UPDATE users u
+        SET change_seq = ordered.seq
+        FROM (SELECT id, row_number() OVER (ORDER BY updated_at, id) AS seq FROM users) ordered
+        WHERE u.id = ordered.id;
+
+        UPDATE users_version SET version = greatest(version, (SELECT count(*) FROM users));
+
+        CREATE UNIQUE INDEX IF NOT EXISTS users_change_seq_idx
+        ON users (change_seq);
+
+        CREATE OR REPLACE FUNCTION stamp_user_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE users_version SET version = version + 1, modified_at = clock_timestamp()
+            RETURNING version INTO NEW.change_seq;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql';
+
+        -- Per row now (a bulk import bumps the version once per imported user)
+        DROP TRIGGER IF EXISTS users_version_insert ON users;
+        DROP TRIGGER IF EXISTS users_version_update ON users;
+
+        CREATE TRIGGER users_stamp_insert
+            BEFORE INSERT ON users
+            FOR EACH ROW
+            EXECUTE FUNCTION stamp_user_change();
+
+        CREATE TRIGGER users_stamp_update
+            BEFORE UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.full_name IS DISTINCT FROM NEW.full_name
+                  OR OLD.email IS DISTINCT FROM NEW.email
+                  OR OLD.password IS DISTINCT FROM NEW.password
+                  OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+            EXECUTE FUNCTION stamp_user_change();
+
+        DROP INDEX IF EXISTS users_updated_at_id_idx;
+    '''),
+    Migration(6, "version user rows", '''
+        -- Bumped by every user-visible write of the row, so a page's (id, row_version) pairs identify its
+        -- content without a table-wide counter every writer would have to lock
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS row_version INTEGER NOT NULL DEFAULT 1;
+
+        CREATE OR REPLACE FUNCTION bump_user_row_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.row_version = OLD.row_version + 1;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql';
+
+        CREATE TRIGGER users_bump_row_version
+            BEFORE UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.full_name IS DISTINCT FROM NEW.full_name
+                  OR OLD.email IS DISTINCT FROM NEW.email
+                  OR OLD.password IS DISTINCT FROM NEW.password
+                  OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+            EXECUTE FUNCTION bump_user_row_version();
+    '''),
+    Migration(7, "order user changes by transaction id", '''
+        -- Migration 5 stamped rows from one counter row that every writer had to lock. Instead, each row
+        -- records the id of the transaction that last changed it, and each notification carries the
+        -- xmin of that transaction's snapshot: every transaction below it had finished, so every change
+        -- committed after the notification has a transaction id at or above it. Resuming from that
+        -- horizon replays changes from transactions at or above it, needing no shared state
+        DROP TRIGGER IF EXISTS users_stamp_insert ON users;
+        DROP TRIGGER IF EXISTS users_stamp_update ON users;
+        DROP FUNCTION IF EXISTS stamp_user_change();
+        DROP FUNCTION IF EXISTS bump_users_version();
+        DROP TABLE IF EXISTS users_version;
+        DROP INDEX IF EXISTS users_change_seq_idx;
+        ALTER TABLE users DROP COLUMN IF EXISTS change_seq;
+
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS change_xid xid8;
+
+        CREATE OR REPLACE FUNCTION stamp_user_change_xid()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.change_xid = pg_current_xact_id();
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql';
+
+        CREATE TRIGGER users_stamp_xid_insert
+            BEFORE INSERT ON users
+            FOR EACH ROW
+            EXECUTE FUNCTION stamp_user_change_xid();
+
+        CREATE TRIGGER users_stamp_xid_update
+            BEFORE UPDATE ON users
+            FOR EACH ROW
+            WHEN (OLD.full_name IS DISTINCT FROM NEW.full_name
+                  OR OLD.email IS DISTINCT FROM NEW.email
+                  OR OLD.password IS DISTINCT FROM NEW.password
+                  OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+            EXECUTE FUNCTION stamp_user_change_xid();
+
+        CREATE OR REPLACE FUNCTION notify_user_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('user_changes', (
+                jsonb_build_object(
+                    'op', CASE
+                        WHEN TG_OP = 'INSERT' THEN 'insert'
+                        WHEN NOT NEW.is_active THEN 'delete'
+                        ELSE 'update'
+                    END,
+                    'horizon', pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+                ) || (to_jsonb(NEW) - 'password' - 'last_login' - 'change_xid')
+            )::text);
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+
+        -- Rows changed before this migration have no change_xid; no resumable horizon predates them
+        CREATE INDEX IF NOT EXISTS users_change_xid_id_idx
+        ON users (change_xid, id);
+    '''),
+]
+
+LATEST_VERSION = max(migration.version for migration in MIGRATIONS)
+
+
+async def current_version(conn: asyncpg.Connection) -> int:
+    """Highest applied migration, 0 for a database that has never been migrated"""
+    if await conn.fetchval("SELECT to_regclass('schema_migrations')") is None:
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+
+
+async def acquire_migration_lock(conn: asyncpg.Connection) -> None:
+    """Poll for the migration lock, so waiting on a long migration never hits the pool's command timeout"""
+    delay = LOCK_RETRY_BASE_DELAY
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+        logger.info(f"Another worker is migrating the database, checking again in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, LOCK_RETRY_MAX_DELAY)
+
+
+async def migrate(conn: asyncpg.Connection) -> List[int]:
+    """Apply pending migrations and return their versions; a no-op without locks when the schema is current"""
+    if await current_version(conn) >= LATEST_VERSION:
+        return []
+
+    # Only one worker migrates; the others wait here and then find nothing left to do
+    await acquire_migration_lock(conn)
+    try:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        version = await current_version(conn)
+
+        applied = []
+        for migration in sorted(MIGRATIONS):
+            if migration.version <= version:
+                continue
+            async with conn.transaction():
+                await conn.execute(migration.sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    migration.version, migration.name
+                )
+            logger.info(f"Applied migration {migration.version}: {migration.name}")
+            applied.append(migration.version)
+        return applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
@@ -1,6 +1,6 @@
 from typing import Optional
 from datetime import datetime
-from pydantic import BaseModel, EmailStr, constr, Field
+from pydantic import BaseModel, EmailStr, constr, Field, model_validator
 
 class UserBase(BaseModel):
     """Base user model with common fields"""
@@ -18,6 +18,27 @@ class UserCreate(UserBase):
         description="Password (minimum 8 characters)"
     )
 
+class UserImport(UserBase):
+    """Model for one bulk-imported user: a plain password, or an existing hash when migrating users"""
+    username: constr(min_length=3, max_length=20, pattern="^[a-zA-Z0-9_-]+$") = Field(
+        ...,
+        description="Username (alphanumeric with underscore and hyphen)"
+    )
+    password: Optional[constr(min_length=8, max_length=64)] = Field(
+        None,
+        description="Password (minimum 8 characters)"
+    )
+    password_hash: Optional[constr(min_length=1, max_length=255)] = Field(
+        None,
+        description="Existing argon2 or bcrypt hash, stored without rehashing"
+    )
+
+    @model_validator(mode="after")
+    def one_password(self) -> "UserImport":
+        if (self.password is None) == (self.password_hash is None):
+            raise ValueError("exactly one of password or password_hash is required")
+        return self
+
 class UserUpdate(BaseModel):
     """Model for updating user information"""
     full_name: Optional[constr(min_length=2, max_length=50)] = Field(
@@ -30,6 +51,11 @@ class UserUpdate(BaseModel):
         description="New password (minimum 8 characters)"
     )
 
+class UserLogin(BaseModel):
+    """Model for logging in"""
+    username: str = Field(..., description="Username")
+    password: str = Field(..., description="Password")
+
 class UserResponse(UserBase):
     """Model for user response data"""
     id: int = Field(..., description="User's unique identifier")
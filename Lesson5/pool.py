@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from metrics import REGISTRY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+POOL_ACQUIRE_WAIT = REGISTRY.histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=WAIT_BUCKETS
+)
+POOL_SIZE = REGISTRY.gauge("db_pool_size", "Open connections in the database pool")
+POOL_IDLE = REGISTRY.gauge("db_pool_idle", "Idle connections in the database pool")
+POOL_IN_USE = REGISTRY.gauge("db_pool_in_use", "Connections checked out of the database pool")
+POOL_LIMIT = REGISTRY.gauge("db_pool_limit", "Concurrent checkouts currently allowed by the adaptive limiter")
+QUERY_LATENCY = REGISTRY.histogram(
+    "db_query_seconds",
+    "Time a Database method held its connection",
+    labelnames=("method",)
+)
+
+
+class AdaptiveLimiter:
+    """Caps concurrent pool checkouts and moves the cap between min and max size based on acquire wait.
+
+    asyncpg pools cannot be resized once created, so the pool is built with max_size
+    and this limiter decides how many connections may be in use; connections above
+    the cap go idle and are closed by max_inactive_connection_lifetime.
+    """
+
+    def __init__(
+        self,
+        min_size: int,
+        max_size: int,
+        target_wait: float,
+        adjust_interval: float = 1.0
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_wait = target_wait
+        self.adjust_interval = adjust_interval
+        self.limit = min_size
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._last_adjust = time.monotonic()
+        POOL_LIMIT.set(self.limit)
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_use < self.limit)
+            self._in_use += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def observe(self, wait: float) -> None:
+        """Record one acquire wait and adjust the cap once per interval"""
+        self._wait_total += wait
+        self._wait_count += 1
+        now = time.monotonic()
+        if now - self._last_adjust < self.adjust_interval:
+            return
+
+        average = self._wait_total / self._wait_count
+        self._wait_total, self._wait_count, self._last_adjust = 0.0, 0, now
+        if average > self.target_wait and self.limit < self.max_size:
+            self.limit = min(self.max_size, self.limit + max(1, self.limit // 4))
+            logger.info(f"Pool limit raised to {self.limit} (average acquire wait {average * 1000:.1f} ms)")
+            asyncio.get_running_loop().create_task(self._notify_all())
+        elif average < self.target_wait / 4 and self.limit > self.min_size and self._in_use < self.limit:
+            self.limit -= 1
+            logger.info(f"Pool limit lowered to {self.limit} (average acquire wait {average * 1000:.1f} ms)")
+        POOL_LIMIT.set(self.limit)
+
+    async def _notify_all(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
+
+
+def track_pool(pool_getter) -> None:
+    """Report size, idle and in-use counts of the pool returned by pool_getter on every scrape"""
+
+    def size() -> float:
+        pool = pool_getter()
+        return pool.get_size() if pool else 0
+
+    def idle() -> float:
+        pool = pool_getter()
+        return pool.get_idle_size() if pool else 0
+
+    POOL_SIZE.set_function(size)
+    POOL_IDLE.set_function(idle)
+    POOL_IN_USE.set_function(lambda: size() - idle())
+
+
+def observe_acquire(wait: float, limiter: Optional[AdaptiveLimiter] = None) -> None:
+    POOL_ACQUIRE_WAIT.observe(wait)
+    if limiter:
+        limiter.observe(wait)
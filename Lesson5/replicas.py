@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import asyncpg
+from asyncpg.pool import Pool
+
+from metrics import REGISTRY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Identifies the client of the current request for read-your-writes stickiness
+client_key: ContextVar[Optional[str]] = ContextVar("client_key", default=None)
+
+# Errors that mean "this replica is unusable right now", not "the query is wrong"
+REPLICA_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.CannotConnectNowError,
+)
+
+READS = REGISTRY.counter("db_reads_total", "Read queries by target pool", labelnames=("target",))
+REPLICA_FALLBACKS = REGISTRY.counter(
+    "db_replica_fallbacks_total",
+    "Reads retried on the primary after a replica failed"
+)
+
+
+class ReadYourWrites:
+    """Remembers recently written keys so reads of them go to the primary for a short window"""
+
+    def __init__(self, window: float):
+        self.window = window
+        # key -> expiry; every key gets the same window, so insertion order is expiry order
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+
+    def mark(self, keys: Iterable[str]) -> None:
+        now = time.monotonic()
+        for key in keys:
+            self._expires.pop(key, None)
+            self._expires[key] = now + self.window
+        # Expired keys sit at the front; each is dropped once, so pruning is O(1) per mark on average
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now:
+                break
+            del self._expires[key]
+
+    def is_sticky(self, keys: Iterable[str]) -> bool:
+        now = time.monotonic()
+        return any(self._expires.get(key, 0) > now for key in keys)
+
+
+class ReplicaRouter:
+    """Picks a read replica pool per query and tracks replica health"""
+
+    def __init__(
+        self,
+        urls: List[str],
+        strategy: str = "round_robin",
+        sticky_window: float = 5.0,
+        unhealthy_for: float = 10.0
+    ):
+        if strategy not in ("round_robin", "least_busy"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.urls = urls
+        self.strategy = strategy
+        self.unhealthy_for = unhealthy_for
+        self.pools: List[Pool] = []
+        self.writes = ReadYourWrites(sticky_window)
+        self._unhealthy_until: Dict[int, float] = {}
+        self._counter = itertools.count()
+
+    async def connect(self, create_pool: Callable[[str], Awaitable[Pool]]) -> None:
+        """Create a pool per replica; a replica that cannot be reached is skipped"""
+        if self.pools:
+            return
+        results = await asyncio.gather(*(create_pool(url) for url in self.urls), return_exceptions=True)
+        for url, result in zip(self.urls, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Skipping read replica {url.rsplit('@', 1)[-1]}: {str(result)}")
+            else:
+                self.pools.append(result)
+        if self.urls:
+            logger.info(f"Connected to {len(self.pools)} of {len(self.urls)} read replicas")
+
+    def _with_client(self, keys: Iterable[str]) -> List[str]:
+        keys = list(keys)
+        client = client_key.get()
+        if client:
+            keys.append(f"client:{client}")
+        return keys
+
+    def mark_written(self, *keys: str) -> None:
+        """Route reads of these keys, and of the current client, to the primary for a while"""
+        self.writes.mark(self._with_client(keys))
+
+    def choose(self, *keys: str) -> Optional[Pool]:
+        """Return a replica pool for a read, or None when the read must go to the primary"""
+        if not self.pools or self.writes.is_sticky(self._with_client(keys)):
+            return None
+
+        now = time.monotonic()
+        healthy = [pool for pool in self.pools if self._unhealthy_until.get(id(pool), 0) <= now]
+        if not healthy:
+            return None
+        if self.strategy == "least_busy":
+            return min(healthy, key=lambda pool: pool.get_size() - pool.get_idle_size())
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_failed(self, pool: Pool) -> None:
+        """Take a replica out of rotation for a while after it failed"""
+        self._unhealthy_until[id(pool)] = time.monotonic() + self.unhealthy_for
+        REPLICA_FALLBACKS.inc()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(pool.close() for pool in self.pools), return_exceptions=True)
+        self.pools = []
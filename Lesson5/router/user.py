@@ -1,11 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, List, Optional, Tuple, AsyncIterator
+from datetime import datetime
+import asyncio
+import base64
+import time
+from pydantic import BaseModel, Field, ValidationError
 import asyncpg
 
-from models import UserCreate, UserUpdate, UserResponse, BaseResponse
+import models
+from models import UserCreate, UserUpdate, UserResponse, UserLogin, BaseResponse
 from db import Database, DatabaseError
-from dependencies import get_db
+from hashing import HashingBusyError
+from bulk import iter_rows, constraint_error, UnsupportedFormatError
+from serializers import dump_list, dump_line
+from middleware import add_timing
+from changes import format_event
+from conditional import make_etag, validator_headers, is_not_modified, not_modified
+from config import BULK_IMPORT_BATCH_SIZE, FAST_JSON_RESPONSES, CHANGE_FEED_KEEPALIVE
+from login import LoginService, RateLimitedError
+from dependencies import get_db, get_login_service
+
+MAX_BATCH_IDS = 1000
+CHANGE_BACKFILL_BATCH = 1000
 
 class UserCreate(BaseModel):
     full_name: str
@@ -28,8 +45,35 @@ class BaseResponse(BaseModel):
     message: str
     data: Optional[UserResponse] = None
 
+class BulkImportError(BaseModel):
+    row: int
+    username: Optional[str] = None
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+    # Set when the import stopped early: rows after `processed` were not read
+    processed: int
+    stopped: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class BatchResult(BaseModel):
+    users: List[UserResponse]
+    missing: List[int]
+
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/", response_model=UserResponse)
 async def create_user(user: UserCreate, db: Database = Depends(get_db)):
     """Create a new user"""
@@ -46,30 +90,316 @@ async def create_user(user: UserCreate, db: Database = Depends(get_db)):
             status_code=400,
             detail="Username or email already exists"
         )
+    except HashingBusyError:
+        raise hashing_busy()
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/login", response_model=BaseResponse)
+async def login(request: Request, credentials: UserLogin, service: LoginService = Depends(get_login_service)):
+    """Check a username and password and record the login"""
+    try:
+        ok = await service.login(
+            credentials.username,
+            credentials.password,
+            ip=request.client.host if request.client else None
+        )
+    except RateLimitedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except HashingBusyError:
+        raise hashing_busy()
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    return BaseResponse(message="Login successful")
+
+def make_cursor(user: dict) -> str:
+    """Opaque, URL-safe keyset cursor for the page after this user; usable as-is in a query string"""
+    raw = f"{user['created_at'].isoformat()},{user['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def parse_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor made by make_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, user_id = raw.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_event_id(event_id: str) -> int:
+    """Parse a change feed event id, the transaction id horizon to resume from"""
+    try:
+        return int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid event id, expected an integer")
+
+async def ndjson_lines(users: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for user in users:
+        if FAST_JSON_RESPONSES:
+            yield dump_line(user, UserResponse)
+        else:
+            yield UserResponse.model_validate(user).model_dump_json().encode() + b"\n"
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_users(request: Request, db: Database = Depends(get_db)):
+    """Import users from a JSON array, NDJSON or CSV body using COPY in batches
+
+    Plain passwords are hashed on at most HASH_BULK_CONCURRENCY workers, so at the default argon2 cost
+    they import at tens of rows per second; rows with an existing password_hash skip hashing.
+    """
+    inserted = 0
+    row_number = 0
+    errors: List[BulkImportError] = []
+    seen_usernames = set()
+    seen_emails = set()
+    batch = []
+
+    async def flush() -> None:
+        nonlocal inserted
+        skipped = await db.add_many(batch)
+        inserted += len(batch) - len(skipped)
+        errors.extend(
+            BulkImportError(row=row["row"], username=row["username"], error="Username or email already exists")
+            for row in skipped
+        )
+        batch.clear()
+
+    def summary(stopped: Optional[str] = None) -> BulkImportResult:
+        errors.sort(key=lambda error: error.row)
+        return BulkImportResult(
+            inserted=inserted, failed=len(errors), errors=errors, processed=row_number, stopped=stopped
+        )
+
+    def stop(status_code: int, reason: str, headers: Optional[dict] = None) -> JSONResponse:
+        # Earlier batches are committed; report the unflushed one as not imported so every row is accounted for
+        errors.extend(
+            BulkImportError(row=user["row"], username=user["username"], error=f"Not imported: {reason}")
+            for user in batch
+        )
+        batch.clear()
+        return JSONResponse(summary(reason).model_dump(), status_code=status_code, headers=headers)
+
+    try:
+        async for data in iter_rows(request):
+            row_number += 1
+            try:
+                user = models.UserImport.model_validate(data)
+            except ValidationError as e:
+                errors.append(BulkImportError(row=row_number, error=validation_message(e)))
+                continue
+
+            rejected = constraint_error(user.model_dump())
+            if not rejected and user.password_hash and not db.hasher.is_known_hash(user.password_hash):
+                rejected = "password_hash: not a hash of a supported scheme"
+            if rejected:
+                errors.append(BulkImportError(row=row_number, username=user.username, error=rejected))
+                continue
+
+            username, email = user.username.lower(), user.email.lower()
+            if username in seen_usernames or email in seen_emails:
+                errors.append(BulkImportError(
+                    row=row_number,
+                    username=user.username,
+                    error="Duplicate username or email in this import"
+                ))
+                continue
+            seen_usernames.add(username)
+            seen_emails.add(email)
+
+            batch.append({"row": row_number, **user.model_dump()})
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        return stop(400, f"Malformed request body: {str(e)}")
+    except HashingBusyError:
+        return stop(503, "Server is busy, please retry the remaining rows shortly", {"Retry-After": "1"})
+    except DatabaseError:
+        # Details are logged by Database; they can include the failing row
+        return stop(500, "Failed to import users")
+
+    return summary()
 
 @router.get("/", response_model=List[UserResponse])
-async def get_users(db: Database = Depends(get_db)):
-    """Get all users"""
+async def get_users(
+    request: Request,
+    response: Response,
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    limit: int = Query(50, ge=1, le=1000, description="Page size"),
+    format: Optional[str] = Query(None, pattern="^ndjson$", description="Stream every user as NDJSON"),
+    db: Database = Depends(get_db)
+):
+    """Get active users, newest first, one keyset page at a time"""
+    cursor = parse_cursor(after) if after else None
+
+    if format == "ndjson":
+        # No validators: the body is read after the headers are sent, so they could not share a snapshot
+        return StreamingResponse(ndjson_lines(db.stream(after=cursor)), media_type="application/x-ndjson")
+
+    try:
+        users = await db.page(limit=limit, after=cursor)
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Derived from the rows themselves: any insert, update or delete that changes this page changes its ETag
+    etag = make_etag(after, limit, *(f"{user['id']}.{user['row_version']}" for user in users))
+    validators = validator_headers(etag, None)
+    if is_not_modified(request, etag, None):
+        # Revalidations skip serialization, the expensive part of a large page
+        return not_modified(validators)
+
+    headers = dict(validators)
+    if len(users) == limit:
+        next_cursor = make_cursor(users[-1])
+        next_url = request.url.include_query_params(after=next_cursor, limit=limit)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    if FAST_JSON_RESPONSES:
+        # Skip response_model re-validation and the stdlib encoder
+        started = time.perf_counter()
+        content = dump_list(users, UserResponse)
+        add_timing("serialize", time.perf_counter() - started)
+        return Response(content, media_type="application/json", headers=headers)
+
+    response.headers.update(headers)
+    return [dict(user) for user in users]
+
+async def change_events(db: Database, horizon: Optional[int]) -> AsyncIterator[bytes]:
+    # Subscribe here rather than in the endpoint: this only runs once the response streams, and its
+    # finally always runs then. Subscribing before the backfill query means no change falls between the two
+    subscription = db.changes.subscribe()
+    try:
+        # Tell EventSource clients to reconnect quickly; they send Last-Event-ID when they do
+        yield b"retry: 1000\n\n"
+        # Row versions sent by the backfill; live changes buffered meanwhile may be older than those
+        backfilled: Dict[int, int] = {}
+        if horizon is not None:
+            # Catch up from the table while the subscription buffers live changes. Delivery is at least
+            # once: changes near the horizon may repeat, but none committed after it is missed
+            position = (horizon, 0)
+            while True:
+                changes = await db.changes_after(position, CHANGE_BACKFILL_BATCH)
+                for change in changes:
+                    position = (change["change_xid"], change["id"])
+                    backfilled[change["id"]] = change["row_version"]
+                    yield format_event(change, horizon)
+                if len(changes) < CHANGE_BACKFILL_BATCH:
+                    break
+
+        while True:
+            try:
+                change = await asyncio.wait_for(subscription.get(), timeout=CHANGE_FEED_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if change is None:
+                break
+            if backfilled.get(change["id"], 0) >= change["row_version"]:
+                # The backfill already sent this version of the row, or a newer one
+                continue
+            yield format_event(change, change["horizon"])
+    finally:
+        db.changes.unsubscribe(subscription)
+
+@router.get("/changes")
+async def user_changes(
+    request: Request,
+    after: Optional[str] = Query(None, description="Resume from this event id"),
+    db: Database = Depends(get_db)
+):
+    """Stream user inserts, updates and deletes as server-sent events, resuming from Last-Event-ID"""
+    cursor = request.headers.get("Last-Event-ID") or after
+    cursor = parse_event_id(cursor) if cursor else None
+    if not db.changes.listening:
+        raise HTTPException(
+            status_code=503,
+            detail="Change feed is not available, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    return StreamingResponse(
+        change_events(db, cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/search", response_model=List[UserResponse])
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100, description="Text to look for in name, username or email"),
+    prefix: bool = Query(False, description="Autocomplete: match only the start of each field"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
+    db: Database = Depends(get_db)
+):
+    """Search active users, best matches first (alphabetical by username in prefix mode)"""
+    try:
+        return await db.search(q, limit=limit, prefix=prefix)
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def batch_result(ids: List[int], db: Database) -> BatchResult:
+    try:
+        users = await db.get_many(ids)
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    ordered = list(dict.fromkeys(ids))
+    return BatchResult(
+        users=[users[user_id] for user_id in ordered if user_id in users],
+        missing=[user_id for user_id in ordered if user_id not in users]
+    )
+
+@router.get("/batch", response_model=BatchResult)
+async def get_users_batch(
+    ids: str = Query(..., description=f"Comma-separated user IDs, at most {MAX_BATCH_IDS}"),
+    db: Database = Depends(get_db)
+):
+    """Get several users by ID in one request and one query"""
     try:
-        return await db.all()
+        user_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not user_ids or len(user_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_BATCH_IDS} ids")
+    return await batch_result(user_ids, db)
+
+@router.post("/batch", response_model=BatchResult)
+async def post_users_batch(batch: BatchRequest, db: Database = Depends(get_db)):
+    """Same as GET /batch, for ID lists too long for a URL"""
+    return await batch_result(batch.ids, db)
+
+@router.get("/{user_id}", response_model=UserResponse)
+async def get_user(user_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    """Get user by ID"""
+    try:
+        user = await db.get_by_id(user_id)
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User with ID {user_id} not found"
+        )
 
-# @router.get("/{user_id}", response_model=UserResponse)
-# async def get_user(user_id: int, db: Database = Depends(get_db)):
-#     """Get user by ID"""
-#     try:
-#         user = await db.get_by_id(user_id)
-#         if not user:
-#             raise HTTPException(
-#                 status_code=404,
-#                 detail=f"User with ID {user_id} not found"
-#             )
-#         return user
-#     except DatabaseError as e:
-#         raise HTTPException(status_code=500, detail=str(e))
+    validators = validator_headers(make_etag(user["id"], user["row_version"]), user["updated_at"])
+    if is_not_modified(request, validators["ETag"], user["updated_at"]):
+        return not_modified(validators)
+    response.headers.update(validators)
+    return user
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -96,6 +426,8 @@ async def update_user(
             status_code=400,
             detail="Email already exists"
         )
+    except HashingBusyError:
+        raise hashing_busy()
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import Any, Iterable, List, Mapping, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to pydantic's compiled serializer
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def _project(rows: Iterable[Mapping[str, Any]], fields: tuple) -> List[dict]:
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def dump_list(rows: Iterable[Mapping[str, Any]], model: Type[BaseModel]) -> bytes:
+    """Serialize database rows straight to a JSON array shaped like model, validating at most once"""
+    fields = tuple(model.model_fields)
+    if orjson is not None:
+        return orjson.dumps(_project(rows, fields))
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(_project(rows, fields)))
+
+
+def dump_line(row: Mapping[str, Any], model: Type[BaseModel]) -> bytes:
+    """Serialize one database row as an NDJSON line shaped like model"""
+    fields = tuple(model.model_fields)
+    if orjson is not None:
+        return orjson.dumps({field: row[field] for field in fields}, option=orjson.OPT_APPEND_NEWLINE)
+    return model.model_validate({field: row[field] for field in fields}).model_dump_json().encode() + b"\n"
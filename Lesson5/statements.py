@@ -0,0 +1,147 @@
+import itertools
+from typing import Any, Dict, Iterable, List, Optional
+
+import asyncpg
+
+USER_COLUMNS = "id, full_name, username, email, created_at, updated_at, is_active, row_version"
+
+# Columns Database.update may set, in the order they appear in the SET clause
+UPDATE_FIELDS = ("full_name", "email", "password")
+
+# Every fixed query the Database class runs, by name; asyncpg's statement cache prepares each per connection
+STATEMENTS: Dict[str, str] = {
+    "add": f"""
+        INSERT INTO users (full_name, username, email, password)
+        VALUES ($1, $2, $3, $4)
+        RETURNING {USER_COLUMNS}
+    """,
+    "all": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE is_active = TRUE
+        ORDER BY created_at DESC
+    """,
+    "page_first": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE is_active = TRUE
+        ORDER BY created_at DESC, id DESC
+        LIMIT $1
+    """,
+    "page_after": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE is_active = TRUE AND (created_at, id) < ($1, $2)
+        ORDER BY created_at DESC, id DESC
+        LIMIT $3
+    """,
+    "search": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE is_active = TRUE
+          AND (lower(full_name) LIKE $2 OR username LIKE $2 OR email LIKE $2
+               OR lower(full_name) % $1 OR username % $1 OR email % $1)
+        ORDER BY greatest(
+            similarity(lower(full_name), $1), similarity(username, $1), similarity(email, $1)
+        ) DESC, id
+        LIMIT $3
+    """,
+    "search_prefix": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE is_active = TRUE
+          AND (username LIKE $1 OR lower(full_name) LIKE $1 OR email LIKE $1)
+        ORDER BY username
+        LIMIT $2
+    """,
+    "changes_after": f"""
+        SELECT {USER_COLUMNS}, change_xid::text::bigint AS change_xid
+        FROM users
+        WHERE (change_xid, id) > ($1::text::xid8, $2)
+        ORDER BY change_xid, id
+        LIMIT $3
+    """,
+    "get_by_id": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE id = $1 AND is_active = TRUE
+    """,
+    "get_many": f"""
+        SELECT {USER_COLUMNS}
+        FROM users
+        WHERE id = ANY($1::int[]) AND is_active = TRUE
+    """,
+    "verify_password": """
+        SELECT password
+        FROM users
+        WHERE username = $1 AND is_active = TRUE
+    """,
+    "upgrade_password": """
+        UPDATE users
+        SET password = $3
+        WHERE username = $1 AND password = $2 AND is_active = TRUE
+        RETURNING id
+    """,
+    "update_last_logins": """
+        WITH locked AS (
+            -- Lock rows in username order, so flushes from different workers cannot deadlock
+            SELECT u.id, v.last_login
+            FROM users AS u
+            JOIN unnest($1::text[], $2::timestamptz[]) AS v(username, last_login) ON u.username = v.username
+            WHERE u.is_active = TRUE
+              AND (u.last_login IS NULL OR u.last_login < v.last_login)
+            ORDER BY u.username
+            FOR UPDATE OF u
+        )
+        UPDATE users AS u
+        SET last_login = locked.last_login
+        FROM locked
+        WHERE u.id = locked.id
+    """,
+    "delete": """
+        UPDATE users
+        SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1 AND is_active = TRUE
+        RETURNING username
+    """,
+}
+
+
+def update_statement_name(fields: Iterable[str]) -> str:
+    """Name of the update statement that sets exactly the given fields"""
+    present = set(fields)
+    return "update:" + ",".join(field for field in UPDATE_FIELDS if field in present)
+
+
+def _update_statement(fields: List[str]) -> str:
+    assignments = ", ".join(f"{field} = ${index}" for index, field in enumerate(fields, start=1))
+    return f"""
+        UPDATE users
+        SET {assignments}
+        WHERE id = ${len(fields) + 1} AND is_active = TRUE
+        RETURNING {USER_COLUMNS}
+    """
+
+
+# Enumerate the 7 non-empty combinations of updatable fields as fixed statements
+for _size in range(1, len(UPDATE_FIELDS) + 1):
+    for _fields in itertools.combinations(UPDATE_FIELDS, _size):
+        STATEMENTS[update_statement_name(_fields)] = _update_statement(list(_fields))
+
+
+class PreparedConnection(asyncpg.Connection):
+    """Connection that runs registry statements by name.
+
+    asyncpg's per-connection statement cache prepares each query text on first use and reuses it
+    on every later checkout, so the registry only has to keep the texts fixed. Holding on to
+    PreparedStatement objects instead would break: the pool invalidates them on release.
+    """
+
+    async def fetch_named(self, name: str, *args: Any) -> List[asyncpg.Record]:
+        return await self.fetch(STATEMENTS[name], *args)
+
+    async def fetchrow_named(self, name: str, *args: Any) -> Optional[asyncpg.Record]:
+        return await self.fetchrow(STATEMENTS[name], *args)
+
+    async def fetchval_named(self, name: str, *args: Any) -> Any:
+        return await self.fetchval(STATEMENTS[name], *args)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from metrics import REGISTRY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LAST_LOGIN_PENDING = REGISTRY.gauge(
+    "last_login_pending",
+    "Usernames with a buffered last-login timestamp not yet written"
+)
+LAST_LOGIN_FLUSHED = REGISTRY.counter(
+    "last_login_flushed_total",
+    "Last-login timestamps written to the database"
+)
+LAST_LOGIN_FLUSH_FAILURES = REGISTRY.counter(
+    "last_login_flush_failures_total",
+    "Failed last-login batch writes (entries are kept for the next flush)"
+)
+
+FlushFunc = Callable[[List[str], List[datetime]], Awaitable[None]]
+
+
+class LastLoginBuffer:
+    """Coalesces last-login timestamps per username and writes them in batches"""
+
+    def __init__(self, write: FlushFunc, interval: float = 0.5, max_entries: int = 1000):
+        self._write = write
+        self.interval = interval
+        self.max_entries = max_entries
+        self._pending: Dict[str, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, username: str, at: Optional[datetime] = None) -> None:
+        """Remember the latest login of a user; written on the next flush"""
+        at = at or datetime.now(timezone.utc)
+        previous = self._pending.get(username)
+        if previous is None or previous < at:
+            self._pending[username] = at
+        LAST_LOGIN_PENDING.set(len(self._pending))
+        if len(self._pending) >= self.max_entries:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the background flush loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write every buffered timestamp in a single statement"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await self._write(list(batch), list(batch.values()))
+                LAST_LOGIN_FLUSHED.inc(len(batch))
+            except BaseException as e:
+                # Put the batch back unless a newer login arrived meanwhile
+                for username, at in batch.items():
+                    newer = self._pending.get(username)
+                    if newer is None or newer < at:
+                        self._pending[username] = at
+                if not isinstance(e, Exception):
+                    raise
+                LAST_LOGIN_FLUSH_FAILURES.inc()
+                logger.error(f"Failed to flush {len(batch)} last-login timestamps: {str(e)}")
+            finally:
+                LAST_LOGIN_PENDING.set(len(self._pending))
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()